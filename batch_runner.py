@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from llm_model.ai_app import AIApp
+from mcp_client import MCPClient, SERVER_SCRIPT_PATH
+
+
+def read_finished_ids(output_path: str) -> set:
+    """
+    读取输出文件中已成功完成的查询 id，用于中断后续跑。
+
+    :param output_path: 输出 JSONL 文件路径
+    :return: 已成功完成的查询 id 集合
+    """
+    finished = set()
+    if not os.path.exists(output_path):
+        return finished
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 中断时可能留下半行，忽略即可
+                continue
+            if record.get("error") is None:
+                finished.add(str(record.get("id")))
+    return finished
+
+
+def truncate_partial_line(output_path: str):
+    """
+    中断时输出文件末尾可能留下不完整的一行，续跑前截断到最后一个完整行，
+    避免新结果接在半行后面导致整行无法解析。
+
+    :param output_path: 输出 JSONL 文件路径
+    """
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        # 从文件末尾向前分块查找最后一个换行符
+        while position > 0:
+            size = min(4096, position)
+            position -= size
+            f.seek(position)
+            newline = f.read(size).rfind(b"\n")
+            if newline != -1:
+                position += newline + 1
+                break
+        if position != end:
+            print(f"输出文件末尾有 {end - position} 字节不完整的记录，已截断")
+            f.truncate(position)
+
+
+def iter_queries(input_path: str):
+    """
+    逐行读取输入 JSONL，每行格式为 {"id": ..., "query": ...}，缺少 id 时使用行号。
+
+    :param input_path: 输入 JSONL 文件路径
+    :return: (查询 id, 查询语句) 的生成器
+    """
+    with open(input_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                print(f"第 {line_no} 行不是合法 JSON，已跳过: {e}")
+                continue
+            query = record.get("query")
+            if not query:
+                print(f"第 {line_no} 行缺少 query 字段，已跳过")
+                continue
+            yield str(record.get("id", line_no)), query
+
+
+class BatchRunner:
+    """
+    非交互式批量查询：从 JSONL 流式读取查询，以有限并发调用 process_query，结果逐条追加写入输出 JSONL。
+    """
+
+    def __init__(self, client: MCPClient, input_path: str, output_path: str, concurrency: int = 4):
+        self.client = client
+        self.input_path = input_path
+        self.output_path = output_path
+        self.concurrency = max(1, concurrency)
+        self.stats = {"succeeded": 0, "failed": 0, "skipped": 0}
+        self.latencies = []
+        # 首段输出时间
+        self.ttfts = []
+
+    async def run(self):
+        """
+        执行批量查询，已在输出文件中成功完成的 id 会被跳过。
+        """
+        truncate_partial_line(self.output_path)
+        finished = read_finished_ids(self.output_path)
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        start = time.perf_counter()
+
+        with open(self.output_path, 'a', encoding='utf-8') as output:
+            workers = [asyncio.create_task(self._worker(queue, output)) for _ in range(self.concurrency)]
+            try:
+                for query_id, query in iter_queries(self.input_path):
+                    if query_id in finished:
+                        self.stats["skipped"] += 1
+                        continue
+                    # 队列有上限，输入文件再大也只会在内存中保留少量待处理查询
+                    await queue.put((query_id, query))
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+        self.print_summary(time.perf_counter() - start)
+
+    async def _worker(self, queue: asyncio.Queue, output):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            query_id, query = item
+            record = {"id": query_id, "query": query, "response": None, "error": None}
+            timings = {}
+            start = time.perf_counter()
+            try:
+                record["response"] = await self.client.answer_query(query, timings)
+                self.stats["succeeded"] += 1
+            except Exception as e:
+                record["error"] = str(e) or type(e).__name__
+                self.stats["failed"] += 1
+            record["latency"] = round(time.perf_counter() - start, 4)
+            record["ttft"] = round(timings["ttft"], 4) if timings.get("ttft") is not None else None
+            self.latencies.append(record["latency"])
+            if record["ttft"] is not None:
+                self.ttfts.append(record["ttft"])
+
+            # 每条结果立即落盘，中断后可以按 id 续跑
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+
+    def print_summary(self, total: float):
+        """
+        打印批量查询汇总。
+
+        :param total: 总耗时（秒）
+        """
+        processed = self.stats["succeeded"] + self.stats["failed"]
+        print(f"批量查询完成：成功 {self.stats['succeeded']}，失败 {self.stats['failed']}，"
+              f"跳过 {self.stats['skipped']}，总耗时 {total:.2f}s")
+        if processed:
+            latencies = sorted(self.latencies)
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(f"单条耗时 p50 {p50:.2f}s，p95 {p95:.2f}s，吞吐 {processed / total:.2f} 条/秒")
+        if self.ttfts:
+            ttfts = sorted(self.ttfts)
+            print(f"首段输出时间 p50 {ttfts[len(ttfts) // 2]:.2f}s，"
+                  f"p95 {ttfts[min(len(ttfts) - 1, int(len(ttfts) * 0.95))]:.2f}s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="从 JSONL 文件批量执行查询")
+    parser.add_argument("input", nargs="?", default="requests.jsonl", help="输入 JSONL，每行 {\"id\": ..., \"query\": ...}")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="输出 JSONL，已成功的 id 在续跑时跳过")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="同时处理的查询数")
+    parser.add_argument("--metrics", help="结束时导出阶段耗时指标，.prom 后缀为 Prometheus 文本，否则为 JSON")
+    args = parser.parse_args()
+
+    llm = AIApp(config_file='llm_model/config.ini')
+    client = MCPClient(llm=llm, server_script_path=SERVER_SCRIPT_PATH, config_file='config.ini')
+    try:
+        await client.connect_to_all_servers()
+        await BatchRunner(client, args.input, args.output, args.concurrency).run()
+        if args.metrics:
+            fmt = "prometheus" if args.metrics.endswith(".prom") else "json"
+            with open(args.metrics, 'w', encoding='utf-8') as f:
+                f.write(await client.export_metrics(fmt))
+    finally:
+        await client.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import json
+import re
+import time
+
+from aiohttp import web
+
+# 假 LLM 能识别的城市，查询中每出现一个城市就生成一次天气工具调用
+KNOWN_CITIES = {
+    "北京": "北京", "上海": "上海", "天津": "天津", "重庆": "重庆",
+    "南京": "江苏", "苏州": "江苏", "无锡": "江苏", "杭州": "浙江", "宁波": "浙江",
+    "广州": "广东", "深圳": "广东", "成都": "四川", "武汉": "湖北", "西安": "陕西",
+}
+
+
+class FakeOpenAI:
+    """
+    本地 OpenAI 兼容的 /v1/chat/completions 服务，支持 tool_calls 和流式输出，
+    首 token 延迟和 token 输出速率可配置，用于离线压测。
+    """
+
+    def __init__(self, latency: float = 0.3, token_rate: float = 50.0):
+        # 首 token 延迟（秒）
+        self.latency = latency
+        # 每秒输出的 token 数，每个字符按一个 token 计
+        self.token_rate = token_rate
+        self.requests = 0
+
+    @staticmethod
+    def _pick_weather_tool(tools: list):
+        for tool in tools or []:
+            function = tool.get("function", {})
+            schema = function.get("parameters") or function.get("input_schema") or {}
+            if "city" in schema.get("properties", {}):
+                return function["name"]
+        return None
+
+    def plan(self, body: dict):
+        """
+        根据请求决定回复：提到已知城市且允许调用工具时返回工具调用，否则返回文本。
+
+        :param body: 请求体
+        :return: (文本, 工具调用列表)
+        """
+        messages = body.get("messages", [])
+        system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user_input = messages[-1]["content"] if messages else ""
+
+        tool_name = self._pick_weather_tool(body.get("tools"))
+        if tool_name and "不需要调用工具" not in system_prompt:
+            cities = [city for city in KNOWN_CITIES if city in user_input]
+            if cities:
+                tool_calls = [
+                    {
+                        "id": f"call_{i}",
+                        "type": "function",
+                        "function": {
+                            "name": tool_name,
+                            "arguments": json.dumps({"province": KNOWN_CITIES[city], "city": city}, ensure_ascii=False)
+                        }
+                    }
+                    for i, city in enumerate(cities)
+                ]
+                return None, tool_calls
+
+        summary = re.sub(r"\s+", " ", user_input)[:80]
+        return f"根据查询内容整理如下：{summary}", []
+
+    async def handle_chat(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        body = await request.json()
+        content, tool_calls = self.plan(body)
+        await asyncio.sleep(self.latency)
+
+        if not body.get("stream"):
+            output_tokens = len(content or "") + sum(len(c["function"]["arguments"]) for c in tool_calls)
+            await asyncio.sleep(output_tokens / self.token_rate)
+            message = {"role": "assistant", "content": content}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            return web.json_response({
+                "id": f"chatcmpl-{self.requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "message": message,
+                             "finish_reason": "tool_calls" if tool_calls else "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": output_tokens, "total_tokens": output_tokens},
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        async def send(delta: dict, finish_reason=None):
+            chunk = {
+                "id": f"chatcmpl-{self.requests}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+        interval = 1 / self.token_rate
+        if tool_calls:
+            for index, call in enumerate(tool_calls):
+                await send({"tool_calls": [{"index": index, "id": call["id"], "type": "function",
+                                            "function": {"name": call["function"]["name"], "arguments": ""}}]})
+                arguments = call["function"]["arguments"]
+                for i in range(0, len(arguments), 4):
+                    await asyncio.sleep(interval * 4)
+                    await send({"tool_calls": [{"index": index, "function": {"arguments": arguments[i:i + 4]}}]})
+            await send({}, "tool_calls")
+        else:
+            await send({"role": "assistant", "content": ""})
+            for char in content:
+                await asyncio.sleep(interval)
+                await send({"content": char})
+            await send({}, "stop")
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+
+class FakeWeather:
+    """
+    本地天气接口，返回与 apihz.cn 相同字段的数据，延迟可配置。
+    """
+
+    def __init__(self, latency: float = 0.1):
+        self.latency = latency
+        self.requests = 0
+
+    async def handle_weather(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        province = request.query.get("sheng", "")
+        city = request.query.get("place", "")
+        return web.json_response({
+            "code": 200, "place": f"{province}{city}", "weather1": "晴", "weather2": "多云",
+            "temperature": 22.5, "precipitation": 0, "pressure": 1013, "humidity": 55,
+            "windDirection": "东南风", "windDirectionDegree": 135, "windSpeed": 2.4, "windScale": "2级",
+        })
+
+
+def create_app(llm: FakeOpenAI, weather: FakeWeather) -> web.Application:
+    """
+    创建同时提供假 LLM 和假天气接口的 aiohttp 应用。
+
+    :param llm: 假 LLM
+    :param weather: 假天气接口
+    :return: aiohttp 应用
+    """
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", llm.handle_chat)
+    app.router.add_get("/weather", weather.handle_weather)
+    return app
+
+
+async def start_services(llm: FakeOpenAI, weather: FakeWeather, host: str = "127.0.0.1", port: int = 0):
+    """
+    在当前事件循环中启动假服务。
+
+    :return: (AppRunner, 实际监听的基础 URL)
+    """
+    runner = web.AppRunner(create_app(llm, weather))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="启动离线压测用的假 LLM 和假天气接口")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="LLM 首 token 延迟（秒）")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="LLM 每秒输出 token 数")
+    parser.add_argument("--weather-latency", type=float, default=0.1, help="天气接口延迟（秒）")
+    args = parser.parse_args()
+
+    print(f"LLM base_url: http://127.0.0.1:{args.port}/v1")
+    print(f"WEATHER_API: http://127.0.0.1:{args.port}/weather?id=0&key=0")
+    web.run_app(create_app(FakeOpenAI(args.llm_latency, args.token_rate), FakeWeather(args.weather_latency)),
+                host="127.0.0.1", port=args.port, print=None)
@@ -0,0 +1,247 @@
+import argparse
+import asyncio
+import configparser
+import json
+import os
+import sys
+import tempfile
+import time
+
+package_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(package_dir)
+from llm_model.ai_app import AIApp
+from mcp_client import MCPClient
+from benchmark.fake_services import FakeOpenAI, FakeWeather, start_services
+from startup_profile import ENTRY_POINTS, measure_import
+
+SERVER_SCRIPT = os.path.join(package_dir, 'mcp_server', 'mcp_server_starter.py')
+
+# 各场景轮流使用的查询
+SCENARIOS = {
+    "no_tool": ["你是谁", "介绍一下你自己", "MCP 是什么"],
+    "single_tool": ["南京今天天气怎么样", "杭州现在的天气", "成都天气如何", "深圳今天热吗"],
+    "multi_tool": ["比较一下南京、苏州和杭州的天气", "北京、上海、广州、深圳今天天气", "武汉和西安哪里更暖和"],
+}
+
+
+def percentile(values: list, p: float) -> float:
+    """
+    最近秩法计算百分位数。
+
+    :param values: 样本
+    :param p: 百分位（0-100）
+    :return: 百分位数
+    """
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: list, wall: float, ttfts: list = None) -> dict:
+    stats = {
+        "count": len(latencies),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "throughput": len(latencies) / wall if wall else 0.0,
+    }
+    if ttfts:
+        stats["ttft_p50"] = percentile(ttfts, 50)
+        stats["ttft_p95"] = percentile(ttfts, 95)
+    return stats
+
+
+def write_configs(workdir: str, base_url: str, stream: bool) -> tuple:
+    """
+    生成指向假服务的 LLM、客户端和 MCP 服务器配置。
+
+    :return: (LLM 配置路径, 客户端配置路径)
+    """
+    prompts = configparser.ConfigParser()
+    prompts.read(os.path.join(package_dir, 'llm_model', 'config.ini'), encoding='utf-8')
+
+    llm_config = configparser.ConfigParser()
+    llm_config['API'] = {
+        'api_key': 'benchmark', 'base_url': f"{base_url}/v1", 'model': 'fake',
+        'temperature': '1', 'top_p': '0.5', 'stream': str(stream).lower(),
+    }
+    llm_config['PROMPTS'] = dict(prompts['PROMPTS'])
+    llm_config_path = os.path.join(workdir, 'llm.ini')
+    with open(llm_config_path, 'w', encoding='utf-8') as f:
+        llm_config.write(f)
+
+    server_config = configparser.ConfigParser()
+    server_config['WeatherServer'] = {'WEATHER_API': f"{base_url}/weather?id=0&key=0"}
+    server_config_path = os.path.join(workdir, 'mcp_server.ini')
+    with open(server_config_path, 'w', encoding='utf-8') as f:
+        server_config.write(f)
+
+    client_config = configparser.ConfigParser()
+    client_config['MCPClient'] = {'MANIFEST_PATH': os.path.join(workdir, 'manifest.json')}
+    client_config[f'Server {SERVER_SCRIPT}'] = {'ENV': f"\nMCP_SERVER_CONFIG={server_config_path}"}
+    client_config_path = os.path.join(workdir, 'client.ini')
+    with open(client_config_path, 'w', encoding='utf-8') as f:
+        client_config.write(f)
+
+    return llm_config_path, client_config_path
+
+
+def bench_import(entry: str, iterations: int) -> dict:
+    """
+    测量入口模块的导入耗时：每轮在新进程中导入，包括解释器启动。
+    """
+    module, cwd = ENTRY_POINTS[entry]
+    wall_start = time.perf_counter()
+    latencies = measure_import(module, cwd, iterations)
+    return summarize(latencies, time.perf_counter() - wall_start)
+
+
+async def bench_cold_start(llm_config_path: str, client_config_path: str, manifest_path: str, iterations: int) -> dict:
+    """
+    测量冷启动：每轮新建客户端，删除工具清单后连接所有服务器。
+    """
+    latencies = []
+    wall_start = time.perf_counter()
+    for _ in range(iterations):
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        client = MCPClient(AIApp(llm_config_path), [SERVER_SCRIPT], client_config_path)
+        start = time.perf_counter()
+        try:
+            await client.connect_to_all_servers()
+            latencies.append(time.perf_counter() - start)
+        finally:
+            await client.cleanup()
+    return summarize(latencies, time.perf_counter() - wall_start)
+
+
+async def bench_queries(client: MCPClient, queries: list, iterations: int, concurrency: int) -> dict:
+    """
+    以固定并发执行 iterations 次查询，统计延迟分布和吞吐。
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    ttfts = []
+
+    async def run_one(i: int):
+        async with semaphore:
+            timings = {}
+            async for _ in client.process_query(queries[i % len(queries)], timings):
+                pass
+            latencies.append(timings["total"])
+            if timings["ttft"] is not None:
+                ttfts.append(timings["ttft"])
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(run_one(i) for i in range(iterations)))
+    return summarize(latencies, time.perf_counter() - wall_start, ttfts)
+
+
+def print_report(results: dict):
+    print(f"\n{'场景':<14}{'次数':>6}{'p50(s)':>10}{'p95(s)':>10}{'p99(s)':>10}{'吞吐(次/s)':>14}{'首段p50(s)':>14}")
+    for name, stats in results.items():
+        ttft = f"{stats['ttft_p50']:.3f}" if 'ttft_p50' in stats else "-"
+        print(f"{name:<16}{stats['count']:>6}{stats['p50']:>10.3f}{stats['p95']:>10.3f}"
+              f"{stats['p99']:>10.3f}{stats['throughput']:>14.2f}{ttft:>16}")
+
+
+def compare_baseline(results: dict, baseline_path: str, max_regression: float) -> bool:
+    """
+    与基线比较 p95，任一场景变慢超过 max_regression 比例即视为回归。
+
+    :return: 是否通过
+    """
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    passed = True
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        base_p95 = baseline[name]["p95"]
+        if base_p95 > 0 and stats["p95"] > base_p95 * (1 + max_regression):
+            print(f"性能回归: {name} p95 {stats['p95']:.3f}s，基线 {base_p95:.3f}s")
+            passed = False
+    return passed
+
+
+def check_budgets(results: dict, import_budget: float = None, startup_budget: float = None) -> bool:
+    """
+    检查启动耗时预算：导入场景的 p95 不超过 import_budget，冷启动的 p95 不超过 startup_budget。
+
+    :return: 是否通过
+    """
+    passed = True
+    budgets = [(name, import_budget) for name in results if name.startswith("import_")]
+    budgets.append(("cold_start", startup_budget))
+    for name, budget in budgets:
+        if budget is None or name not in results:
+            continue
+        if results[name]["p95"] > budget:
+            print(f"超出启动预算: {name} p95 {results[name]['p95']:.3f}s，预算 {budget:.3f}s")
+            passed = False
+    return passed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="离线端到端压测：假 LLM + 假天气接口 + 真实 stdio MCP 服务器")
+    parser.add_argument("--iterations", type=int, default=30, help="每个查询场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=4, help="查询并发数")
+    parser.add_argument("--cold-start-iterations", type=int, default=3, help="冷启动测量次数")
+    parser.add_argument("--stream", action="store_true", help="LLM 使用流式输出")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="假 LLM 首 token 延迟（秒）")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="假 LLM 每秒输出 token 数")
+    parser.add_argument("--weather-latency", type=float, default=0.1, help="假天气接口延迟（秒）")
+    parser.add_argument("--json", help="把结果写入 JSON 文件，可作为之后的基线")
+    parser.add_argument("--baseline", help="基线 JSON 文件，p95 回归超过阈值时以非零状态退出")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="允许的 p95 回归比例")
+    parser.add_argument("--import-iterations", type=int, default=5, help="客户端和服务器入口导入耗时的测量次数")
+    parser.add_argument("--import-budget", type=float, help="入口导入耗时 p95 上限（秒），超出时以非零状态退出")
+    parser.add_argument("--startup-budget", type=float, help="冷启动 p95 上限（秒），超出时以非零状态退出")
+    args = parser.parse_args()
+
+    results = {}
+    for entry in ENTRY_POINTS:
+        results[f"import_{entry}"] = bench_import(entry, args.import_iterations)
+
+    llm = FakeOpenAI(args.llm_latency, args.token_rate)
+    weather = FakeWeather(args.weather_latency)
+    runner, base_url = await start_services(llm, weather)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            llm_config_path, client_config_path = write_configs(workdir, base_url, args.stream)
+            manifest_path = os.path.join(workdir, 'manifest.json')
+
+            results["cold_start"] = await bench_cold_start(
+                llm_config_path, client_config_path, manifest_path, args.cold_start_iterations)
+
+            client = MCPClient(AIApp(llm_config_path), [SERVER_SCRIPT], client_config_path)
+            try:
+                await client.connect_to_all_servers()
+                # 按清单预热的 server 在后台启动，等其完成后再计时，避免首批查询把启动耗时计入延迟
+                await asyncio.gather(*client.background_tasks, return_exceptions=True)
+                # 不计时的预热查询：承担首次请求时才导入 openai、创建 LLM 客户端的开销；
+                # 不调用工具，不影响天气服务器缓存
+                async for _ in client.process_query(SCENARIOS["no_tool"][0]):
+                    pass
+                for name, queries in SCENARIOS.items():
+                    results[name] = await bench_queries(client, queries, args.iterations, args.concurrency)
+            finally:
+                await client.cleanup()
+    finally:
+        await runner.cleanup()
+
+    print_report(results)
+    print(f"假 LLM 请求 {llm.requests} 次，假天气接口请求 {weather.requests} 次")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    passed = check_budgets(results, args.import_budget, args.startup_budget)
+    if args.baseline and not compare_baseline(results, args.baseline, args.max_regression):
+        passed = False
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+import json
+import string
+from typing import Optional
+
+from utills import canonical_tool_call
+
+
+class FastPath:
+    """
+    快速回答：查询只调用了一个工具，且工具返回的 JSON 对象（或对象数组）包含模板所需的全部字段时，
+    直接用该工具的回答模板在本地生成回答，省去第二次 LLM 调用。
+    """
+
+    def __init__(self, templates: dict, bypass_fields=(), note_field: str = None, enabled: bool = True):
+        # 工具名 -> 回答模板，模板中用 {字段名} 引用工具结果的字段，数组结果每项渲染一行
+        self.templates = templates
+        # 结果中出现这些字段（如错误信息）时不走快速回答，交给 LLM 处理
+        self.bypass_fields = tuple(bypass_fields)
+        # 附加说明字段（如缓存提示），模板未引用时放在该项回答前面
+        self.note_field = note_field
+        self.enabled = enabled
+
+        self.stats = {"hits": 0, "misses": 0, "summary_calls": 0, "summary_seconds": 0.0}
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        按 [FastPath] 节和各工具的 [FastPath <工具名>] 节创建快速回答规则。
+
+        :param config: ConfigParser 实例
+        :return: FastPath 实例
+        """
+        templates = {}
+        for section in config.sections():
+            if section.startswith('FastPath ') and config.has_option(section, 'TEMPLATE'):
+                # 模板可能包含 %，不做插值
+                templates[section[len('FastPath '):]] = config.get(section, 'TEMPLATE', raw=True)
+        bypass_fields = config.get('FastPath', 'BYPASS_FIELDS', fallback='')
+        return cls(
+            templates,
+            bypass_fields=[field.strip() for field in bypass_fields.split(',') if field.strip()],
+            note_field=config.get('FastPath', 'NOTE_FIELD', fallback='') or None,
+            enabled=config.getboolean('FastPath', 'ENABLED', fallback=False),
+        )
+
+    def render(self, tool_calls: list, tool_results: list) -> Optional[str]:
+        """
+        尝试用模板生成回答。
+
+        :param tool_calls: 模型给出的工具调用
+        :param tool_results: 工具返回的文本，顺序与去重后的调用一致
+        :return: 回答文本，不满足规则时返回 None
+        """
+        if not self.enabled or not tool_calls:
+            return None
+        answer = self._render(tool_calls, tool_results)
+        self.stats["hits" if answer is not None else "misses"] += 1
+        return answer
+
+    def _render(self, tool_calls: list, tool_results: list) -> Optional[str]:
+        # 只处理单个工具调用（重复的相同调用视为一个）
+        if len({canonical_tool_call(tool_call) for tool_call in tool_calls}) != 1 or not tool_results:
+            return None
+        template = self.templates.get(tool_calls[0]["name"])
+        if template is None:
+            return None
+        try:
+            value = json.loads(tool_results[0])
+        except (TypeError, ValueError):
+            return None
+
+        items = value if isinstance(value, list) else [value]
+        if not items or not all(isinstance(item, dict) for item in items):
+            return None
+
+        fields = {name for _, name, _, _ in string.Formatter().parse(template) if name}
+        lines = []
+        for item in items:
+            if any(field in item for field in self.bypass_fields) or not fields <= item.keys():
+                return None
+            try:
+                line = template.format_map(item)
+            except (ValueError, TypeError):
+                return None
+            if self.note_field and item.get(self.note_field) and self.note_field not in fields:
+                line = f"（{item[self.note_field]}）{line}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def record_summary_latency(self, seconds: float):
+        """
+        记录一次第二轮 LLM 调用的耗时，用于估算快速回答节省的时间。
+
+        :param seconds: 耗时（秒）
+        """
+        self.stats["summary_calls"] += 1
+        self.stats["summary_seconds"] += seconds
+
+    def summary(self) -> str:
+        """
+        快速回答的命中率和估算节省的时间（命中次数 × 第二轮 LLM 调用的平均耗时）。
+
+        :return: 统计文本
+        """
+        if not self.enabled:
+            return "快速回答：未开启"
+        attempts = self.stats["hits"] + self.stats["misses"]
+        if not attempts:
+            return "快速回答：暂无工具调用"
+        text = f"快速回答：命中 {self.stats['hits']}/{attempts}（{self.stats['hits'] / attempts:.0%}）"
+        if self.stats["summary_calls"]:
+            average = self.stats["summary_seconds"] / self.stats["summary_calls"]
+            text += f"，第二轮 LLM 平均耗时 {average:.2f}s，估计共节省 {average * self.stats['hits']:.2f}s"
+        return text
@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+import configparser
+import json
+import signal
+from contextlib import aclosing, asynccontextmanager
+
+from aiohttp import web
+
+from llm_model.ai_app import AIApp
+from llm_model.scheduler import LLMUnavailableError
+from mcp_client import MCPClient, SERVER_SCRIPT_PATH
+
+
+def json_response(data: dict, status: int = 200, headers: dict = None) -> web.Response:
+    """返回 JSON 响应，中文不转义"""
+    return web.json_response(data, status=status, headers=headers, dumps=lambda obj: json.dumps(obj, ensure_ascii=False))
+
+
+class Overloaded(Exception):
+    """排队已满或排队超时，请求被拒绝"""
+
+    def __init__(self, status: int, reason: str):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+
+
+class QueryServer:
+    """
+    HTTP 服务：多个请求共享同一个 MCPClient 及其已连接的 MCP 会话。
+    同时处理的查询数有上限，超出的请求排队等待，队列满时返回 429；关闭时停止接收新请求并等待已接收的请求完成。
+    """
+
+    def __init__(self, client: MCPClient, max_inflight: int = 16, max_queue: int = 64,
+                 queue_timeout: float = 30, drain_timeout: float = 60):
+        self.client = client
+        self.max_inflight = max(1, max_inflight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.drain_timeout = drain_timeout
+
+        self.slots = asyncio.Semaphore(self.max_inflight)
+        self.inflight = 0
+        self.queued = 0
+        self.draining = False
+        # 已接收（排队中或处理中）的请求全部结束时触发，用于关闭时等待
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+        self.stats = {"served": 0, "failed": 0, "rejected": 0, "timeouts": 0}
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/query', self.handle_query)
+        app.router.add_get('/health', self.handle_health)
+        app.router.add_get('/metrics', self.handle_metrics)
+        return app
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        获取一个处理名额：有空闲名额时立即进入，否则排队；队列已满返回 429，排队超时或服务关闭中返回 503。
+        """
+        if self.draining:
+            raise Overloaded(503, "服务正在关闭")
+        if self.slots.locked() and self.queued >= self.max_queue:
+            raise Overloaded(429, "请求过多，请稍后重试")
+
+        self.idle.clear()
+        try:
+            if self.slots.locked():
+                self.queued += 1
+                try:
+                    await asyncio.wait_for(self.slots.acquire(), self.queue_timeout)
+                except asyncio.TimeoutError:
+                    self.stats["timeouts"] += 1
+                    raise Overloaded(503, "排队超时，请稍后重试")
+                finally:
+                    self.queued -= 1
+            else:
+                # 有空闲名额时 acquire 不会挂起，名额计数立即生效，后续并发到达的请求能看到正确的排队状态
+                await self.slots.acquire()
+
+            self.inflight += 1
+            try:
+                yield
+            finally:
+                self.inflight -= 1
+                self.slots.release()
+        finally:
+            if self.inflight == 0 and self.queued == 0:
+                self.idle.set()
+
+    async def handle_query(self, request: web.Request) -> web.StreamResponse:
+        """
+        POST /query，请求体 {"query": "...", "stream": false}。
+        非流式返回 {"response", "ttft", "latency"}；流式按 NDJSON 逐行返回 {"delta": "..."}，最后一行为 {"done": true, ...} 或 {"error": ...}。
+        """
+        try:
+            body = await request.json()
+        except ValueError:
+            return json_response({"error": "请求体不是合法 JSON"}, status=400)
+        query = body.get("query") if isinstance(body, dict) else None
+        if not isinstance(query, str) or not query.strip():
+            return json_response({"error": "缺少 query 字段"}, status=400)
+
+        try:
+            async with self.slot():
+                if body.get("stream"):
+                    return await self._stream_query(request, query)
+                return await self._answer_query(query)
+        except Overloaded as e:
+            self.stats["rejected"] += 1
+            headers = {"Retry-After": "1"} if e.status == 429 else None
+            return json_response({"error": e.reason}, status=e.status, headers=headers)
+
+    async def _answer_query(self, query: str) -> web.Response:
+        timings = {}
+        try:
+            response = await self.client.answer_query(query, timings)
+        except LLMUnavailableError as e:
+            # LLM 端点重试用完或限流，提示客户端稍后重试
+            self.stats["failed"] += 1
+            return json_response({"error": str(e), "rate_limited": e.rate_limited}, status=503,
+                                 headers={"Retry-After": "5"})
+        except Exception as e:
+            self.stats["failed"] += 1
+            return json_response({"error": str(e) or type(e).__name__}, status=500)
+        self.stats["served"] += 1
+        return json_response({"response": response, "ttft": timings["ttft"], "latency": timings["total"]})
+
+    async def _stream_query(self, request: web.Request, query: str) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson; charset=utf-8"})
+        await response.prepare(request)
+
+        async def send(record: dict):
+            await response.write((json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8'))
+
+        timings = {}
+        try:
+            async with aclosing(self.client.process_query(query, timings)) as answer:
+                async for text in answer:
+                    await send({"delta": text})
+        except ConnectionResetError:
+            # 客户端已断开，停止生成
+            self.stats["failed"] += 1
+            return response
+        except Exception as e:
+            # 响应头已经发出，错误只能写在最后一行
+            self.stats["failed"] += 1
+            await send({"error": str(e) or type(e).__name__})
+        else:
+            self.stats["served"] += 1
+            await send({"done": True, "ttft": timings["ttft"], "latency": timings["total"]})
+        await response.write_eof()
+        return response
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return json_response({
+            "status": "draining" if self.draining else "ok",
+            "inflight": self.inflight,
+            "queued": self.queued,
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            **self.stats,
+            "llm": self.client.llm_app.scheduler.snapshot() if self.client.llm_app.scheduler else None,
+        }, status=503 if self.draining else 200)
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=await self.client.export_metrics("prometheus"), content_type="text/plain")
+
+    async def drain(self):
+        """
+        停止接收新请求，等待已接收的请求处理完成，最多等待 drain_timeout 秒。
+        """
+        self.draining = True
+        print(f"正在关闭：等待 {self.inflight} 个处理中、{self.queued} 个排队中的请求完成")
+        try:
+            await asyncio.wait_for(self.idle.wait(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"等待超时，仍有 {self.inflight} 个请求未完成")
+
+    async def serve(self, host: str, port: int):
+        """
+        启动 HTTP 服务，收到 SIGINT/SIGTERM 后优雅关闭。
+
+        :param host: 监听地址
+        :param port: 监听端口
+        """
+        runner = web.AppRunner(self.create_app())
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        print(f"HTTP 服务已启动: http://{host}:{port}（POST /query，GET /health，GET /metrics）")
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, AttributeError, RuntimeError):
+                # Windows 不支持 add_signal_handler，Ctrl+C 会直接中断，不经过排空
+                pass
+        try:
+            await stop.wait()
+            await self.drain()
+        finally:
+            await runner.cleanup()
+            print(f"HTTP 服务已关闭：完成 {self.stats['served']}，失败 {self.stats['failed']}，"
+                  f"拒绝 {self.stats['rejected']}")
+
+
+async def main():
+    config = configparser.ConfigParser()
+    config.read('config.ini', encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="以 HTTP 服务的形式提供查询接口")
+    parser.add_argument("--host", default=config.get('HTTPServer', 'HOST', fallback='127.0.0.1'), help="监听地址")
+    parser.add_argument("--port", type=int, default=config.getint('HTTPServer', 'PORT', fallback=8080), help="监听端口")
+    parser.add_argument("--max-inflight", type=int, default=config.getint('HTTPServer', 'MAX_INFLIGHT', fallback=16),
+                        help="同时处理的查询数上限")
+    parser.add_argument("--max-queue", type=int, default=config.getint('HTTPServer', 'MAX_QUEUE', fallback=64),
+                        help="排队等待的请求数上限，超出返回 429")
+    args = parser.parse_args()
+
+    llm = AIApp(config_file='llm_model/config.ini')
+    client = MCPClient(llm=llm, server_script_path=SERVER_SCRIPT_PATH, config_file='config.ini')
+    try:
+        await client.connect_to_all_servers()
+        server = QueryServer(
+            client,
+            max_inflight=args.max_inflight,
+            max_queue=args.max_queue,
+            queue_timeout=config.getfloat('HTTPServer', 'QUEUE_TIMEOUT', fallback=30),
+            drain_timeout=config.getfloat('HTTPServer', 'DRAIN_TIMEOUT', fallback=60),
+        )
+        await server.serve(args.host, args.port)
+    finally:
+        await client.cleanup()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,30 @@
+import asyncio
 import configparser
-from openai import OpenAI
+import json
+import os
+import sys
+import time
+from contextlib import aclosing
+
+package_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(package_dir)
+from tracing import TRACER
+from llm_model.response_cache import ResponseCache, make_cache_key
+from llm_model.scheduler import LLMScheduler, LLMUnavailableError
+from utills import estimate_tokens
+
+
+class LLMRequestError(Exception):
+    """LLM 调用失败，或没有生成任何内容"""
 
 
 class AIApp:
     def __init__(self, config_file, tools: list = None):
         self.config = configparser.ConfigParser()
+        # 同步接口专用的事件循环，保证 AsyncOpenAI 的连接池始终绑定在同一个循环上
+        self._sync_loop = None
+        self.cache = None
+        self.scheduler = None
         try:
             self.config.read(config_file, encoding='utf-8')
             self.api_key = self.config.get('API', 'api_key')
@@ -14,73 +34,191 @@ class AIApp:
             self.top_p = float(self.config.get('API', 'top_p'))
             self.stream = self.config.getboolean('API', 'stream')
             self.tools = tools  # 可用的MCP Server，如果没有就是普通对话模型
-            self.client = OpenAI(
-                api_key=self.api_key,
-                base_url=self.base_url
-            )
+            # 可选的精确匹配响应缓存，未开启时为 None
+            self.cache = ResponseCache.from_config(self.config)
+            # 在 [API] 及各 [Endpoint <名称>] 端点之间按限额和负载分配请求，openai 客户端在首次调用时才创建
+            self.scheduler = LLMScheduler.from_config(self.config)
+            if self.cache is not None and self._cache_model() is None:
+                print("各 LLM 端点配置的模型不同，请求前无法确定由哪个模型回答，响应缓存不会生效")
         except (configparser.NoSectionError, configparser.NoOptionError) as e:
             print(f"配置文件读取错误: {e}")
         except Exception as e:
             print(f"初始化LLM时发生错误: {e}")
 
-
-    def _generate_non_stream_response(self, user_input, prompt_index=1):
+    def _build_messages(self, user_input, prompt_index=1):
         system_prompt_key = f'system_prompt{prompt_index}'
+        system_prompt = self.config.get('PROMPTS', system_prompt_key)
+        return [
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': user_input}
+        ]
+
+    def _cache_model(self):
+        """
+        缓存键使用的模型：所有端点使用同一模型时为该模型，否则返回 None（不使用缓存，避免不同模型的回复共用缓存）。
+        """
+        models = {endpoint.model for endpoint in self.scheduler.endpoints} if self.scheduler else set()
+        return models.pop() if len(models) == 1 else None
+
+    def _cache_key(self, messages, stream, tools):
+        if self.cache is None or self.cache.should_bypass(self.temperature):
+            return None
+        model = self._cache_model()
+        if model is None:
+            return None
+        return make_cache_key(model, messages, tools, self.temperature, self.top_p, stream)
+
+    @staticmethod
+    def _prompt_tokens(messages, tools):
+        """估算请求的提示 token 数（消息和工具定义），供调度器按 TPM 限额分配"""
+        return estimate_tokens(json.dumps([messages, tools], ensure_ascii=False))
+
+    async def _agenerate_non_stream_response(self, user_input, prompt_index=1, tools=None):
+        tools = self.tools if tools is None else tools
         try:
-            system_prompt = self.config.get('PROMPTS', system_prompt_key)
-            messages = [
-                {'role': 'system', 'content': system_prompt},
-                {'role': 'user', 'content': user_input}
-            ]
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                stream=False,
-                temperature=self.temperature,
-                top_p=self.top_p,
-                tools=self.tools,
-                parallel_tool_calls=True
-            )
+            messages = self._build_messages(user_input, prompt_index)
+            cache_key = self._cache_key(messages, stream=False, tools=tools)
+            if cache_key is not None:
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    from openai.types.chat import ChatCompletion
+                    return ChatCompletion.model_validate_json(cached)
+
+            with TRACER.span("llm.generate", prompt_index=prompt_index, stream=False):
+                completion = await self.scheduler.complete(
+                    self._prompt_tokens(messages, tools),
+                    messages=messages,
+                    stream=False,
+                    temperature=self.temperature,
+                    top_p=self.top_p,
+                    tools=tools,
+                    parallel_tool_calls=True
+                )
+            if cache_key is not None:
+                await self.cache.put(cache_key, completion.model_dump_json())
             return completion
+        except LLMUnavailableError:
+            # 重试用完或限流，原样交给调用方，以便提示稍后重试
+            raise
         except (configparser.NoSectionError, configparser.NoOptionError) as e:
-            print(f"未找到对应的提示模板: {e}")
-            return None
+            raise LLMRequestError(f"未找到对应的提示模板: {e}") from e
         except Exception as e:
-            print(f"生成回复时发生错误: {e}")
-            return None
+            raise LLMRequestError(f"生成回复时发生错误: {e}") from e
 
-    def _generate_stream_response(self, user_input, prompt_index=1):
-        system_prompt_key = f'system_prompt{prompt_index}'
+    async def _agenerate_stream_chunks(self, user_input, prompt_index=1, tools=None):
+        tools = self.tools if tools is None else tools
         try:
-            system_prompt = self.config.get('PROMPTS', system_prompt_key)
-            messages = [
-                {'role': 'system', 'content': system_prompt},
-                {'role': 'user', 'content': user_input}
-            ]
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                stream=True,
-                temperature=self.temperature,
-                top_p=self.top_p,
-                tools=self.tools,
-                parallel_tool_calls=True
-            )
-            response_text = ''
-            for chunk in completion:
-                if chunk.choices[0].delta.content:
-                    response_text += chunk.choices[0].delta.content
-                    yield chunk.choices[0].delta.content
-            return response_text
+            messages = self._build_messages(user_input, prompt_index)
+            cache_key = self._cache_key(messages, stream=True, tools=tools)
+            if cache_key is not None:
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    from openai.types.chat import ChatCompletionChunk
+                    # 按原始分块回放缓存的流式响应
+                    for chunk in json.loads(cached):
+                        yield ChatCompletionChunk.model_validate(chunk)
+                    return
+
+            start = time.perf_counter()
+            first_chunk = True
+            chunks = []
+            with TRACER.span("llm.generate", prompt_index=prompt_index, stream=True):
+                completion = self.scheduler.stream(
+                    self._prompt_tokens(messages, tools),
+                    messages=messages,
+                    stream=True,
+                    temperature=self.temperature,
+                    top_p=self.top_p,
+                    tools=tools,
+                    parallel_tool_calls=True
+                )
+                # 提前停止读取时及时关闭，归还端点的并发名额
+                async with aclosing(completion):
+                    async for chunk in completion:
+                        if first_chunk:
+                            # 首 token 时间
+                            TRACER.observe("llm.ttft", time.perf_counter() - start, prompt_index=prompt_index)
+                            first_chunk = False
+                        if cache_key is not None:
+                            chunks.append(chunk.model_dump(mode="json"))
+                        yield chunk
+            # 只缓存完整结束的流
+            if cache_key is not None:
+                await self.cache.put(cache_key, json.dumps(chunks, ensure_ascii=False))
+        # 流式输出已经开始后无法用返回值表示失败，错误交给调用方处理，避免失败被当作空回答
+        except LLMUnavailableError:
+            raise
         except (configparser.NoSectionError, configparser.NoOptionError) as e:
-            print(f"未找到对应的提示模板: {e}")
-            return None
+            raise LLMRequestError(f"未找到对应的提示模板: {e}") from e
         except Exception as e:
-            print(f"生成回复时发生错误: {e}")
-            return None
+            raise LLMRequestError(f"生成回复时发生错误: {e}") from e
+
+    async def _agenerate_stream_response(self, user_input, prompt_index=1, tools=None):
+        async for chunk in self._agenerate_stream_chunks(user_input, prompt_index, tools):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def agenerate_response(self, user_input, prompt_index=1, tools=None):
+        """
+        异步非流式生成回复，不会阻塞事件循环，可在同一进程中并发处理多个查询。
+
+        :param user_input: 用户输入
+        :param prompt_index: 使用的系统提示模板序号
+        :param tools: 本次请求携带的工具，默认使用 set_tools 设置的全部工具
+        :return: ChatCompletion 对象
+        :raises LLMUnavailableError: 所有端点重试用完或等待额度超时
+        :raises LLMRequestError: 其他 LLM 调用错误
+        """
+        return await self._agenerate_non_stream_response(user_input, prompt_index, tools)
+
+    def astream_response(self, user_input, prompt_index=1, tools=None):
+        """
+        异步流式生成回复。
+
+        :param user_input: 用户输入
+        :param prompt_index: 使用的系统提示模板序号
+        :param tools: 本次请求携带的工具，默认使用 set_tools 设置的全部工具
+        :return: 逐段产出回复文本的异步迭代器
+        :raises LLMRequestError: LLM 调用失败
+        """
+        return self._agenerate_stream_response(user_input, prompt_index, tools)
+
+    def astream_chunks(self, user_input, prompt_index=1, tools=None):
+        """
+        异步流式生成回复，原样产出 ChatCompletionChunk，保留 delta.tool_calls 供调用方拼装工具调用。
+
+        :param user_input: 用户输入
+        :param prompt_index: 使用的系统提示模板序号
+        :param tools: 本次请求携带的工具，默认使用 set_tools 设置的全部工具
+        :return: 逐个产出 ChatCompletionChunk 的异步迭代器
+        :raises LLMRequestError: LLM 调用失败
+        """
+        return self._agenerate_stream_chunks(user_input, prompt_index, tools)
+
+    def _run_sync(self, coro):
+        if self._sync_loop is None or self._sync_loop.is_closed():
+            self._sync_loop = asyncio.new_event_loop()
+        return self._sync_loop.run_until_complete(coro)
+
+    def _generate_non_stream_response(self, user_input, prompt_index=1):
+        return self._run_sync(self.agenerate_response(user_input, prompt_index))
+
+    def _generate_stream_response(self, user_input, prompt_index=1):
+        agen = self.astream_response(user_input, prompt_index)
+        try:
+            while True:
+                try:
+                    yield self._run_sync(agen.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            self._run_sync(agen.aclose())
 
     def generate_response(self, user_input, prompt_index=1):
-        '''必须流式和非流式输出分开处理，不然yield会引起返回对象不管怎样都为generator'''
+        '''
+        同步接口，仅是异步接口的薄封装，不能在运行中的事件循环里调用（协程中请使用 agenerate_response / astream_response）。
+        必须流式和非流式输出分开处理，不然yield会引起返回对象不管怎样都为generator
+        '''
         if self.stream:
             return self._generate_stream_response(user_input, prompt_index)
         else:
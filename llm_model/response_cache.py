@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+def make_cache_key(model, messages, tools, temperature, top_p, stream) -> str:
+    """
+    对请求参数做稳定哈希，作为缓存键。
+
+    :return: sha256 十六进制字符串
+    """
+    payload = {
+        "model": model,
+        "messages": messages,
+        "tools": tools,
+        "temperature": temperature,
+        "top_p": top_p,
+        "stream": stream,
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    LLM 响应的精确匹配缓存：内存 LRU 一级缓存 + 可选的 sqlite 磁盘二级缓存，均带 TTL 和容量上限。
+    缓存值为 JSON 文本：非流式为 ChatCompletion，流式为 ChatCompletionChunk 列表。
+    磁盘读写在单独的线程中串行执行，不阻塞事件循环中的其他查询。
+    """
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 1024, disk_path: str = None,
+                 max_disk_entries: int = 100000, max_temperature: float = 0.3):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        # temperature 高于该值时结果本身带有随机性，不使用缓存
+        self.max_temperature = max_temperature
+
+        # 缓存键 -> (JSON 文本, 写入时间)
+        self._memory = OrderedDict()
+
+        self._db = None
+        self._executor = None
+        if disk_path:
+            # 连接只在 _executor 的单个线程中使用（建表除外），无需加锁
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_created_at ON responses (created_at)")
+            self._db.commit()
+
+        self._puts = 0
+
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0}
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        按 [CACHE] 配置创建缓存，未开启时返回 None。
+
+        :param config: AIApp 的 ConfigParser
+        :return: ResponseCache 或 None
+        """
+        if not config.getboolean('CACHE', 'enabled', fallback=False):
+            return None
+        return cls(
+            ttl=config.getfloat('CACHE', 'ttl', fallback=3600),
+            max_entries=config.getint('CACHE', 'max_entries', fallback=1024),
+            disk_path=config.get('CACHE', 'disk_path', fallback='') or None,
+            max_disk_entries=config.getint('CACHE', 'max_disk_entries', fallback=100000),
+            max_temperature=config.getfloat('CACHE', 'max_temperature', fallback=0.3),
+        )
+
+    def should_bypass(self, temperature: float) -> bool:
+        if temperature > self.max_temperature:
+            self.stats["bypassed"] += 1
+            return True
+        return False
+
+    async def get(self, key: str):
+        """
+        查询缓存，内存未命中时在后台线程中查询磁盘，磁盘命中后回填内存。
+
+        :param key: 缓存键
+        :return: JSON 文本，未命中或已过期时返回 None
+        """
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            value, created_at = entry
+            if now - created_at < self.ttl:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                return value
+            del self._memory[key]
+
+        if self._db is not None:
+            row = await self._run_on_disk(self._select, key, now - self.ttl)
+            if row is not None:
+                self._remember(key, row[0], row[1])
+                self.stats["disk_hits"] += 1
+                return row[0]
+
+        self.stats["misses"] += 1
+        return None
+
+    async def put(self, key: str, value: str):
+        """
+        写入缓存，内存立即可见，磁盘写入在后台线程中完成。
+
+        :param key: 缓存键
+        :param value: JSON 文本
+        """
+        now = time.time()
+        self._remember(key, value, now)
+        if self._db is not None:
+            self._puts += 1
+            await self._run_on_disk(self._insert, key, value, now, self._puts % 100 == 0)
+
+    async def _run_on_disk(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _select(self, key: str, min_created_at: float):
+        return self._db.execute(
+            "SELECT value, created_at FROM responses WHERE key = ? AND created_at > ?", (key, min_created_at)
+        ).fetchone()
+
+    def _insert(self, key: str, value: str, created_at: float, prune: bool):
+        self._db.execute("INSERT OR REPLACE INTO responses (key, value, created_at) VALUES (?, ?, ?)",
+                         (key, value, created_at))
+        if prune:
+            # 定期清理过期条目，并只保留最新的 max_disk_entries 条
+            self._db.execute("DELETE FROM responses WHERE created_at <= ?", (created_at - self.ttl,))
+            self._db.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY created_at DESC LIMIT ?)", (self.max_disk_entries,)
+            )
+        self._db.commit()
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def close(self):
+        if self._executor is not None:
+            # 等待已提交的磁盘写入完成
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
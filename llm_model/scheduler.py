@@ -0,0 +1,393 @@
+import asyncio
+import math
+import random
+import time
+from collections import deque
+
+from tracing import TRACER
+
+# 端点因并发已满而不可用时，重新检查的间隔（秒）
+POLL_INTERVAL = 0.05
+# 统计利用率的时间窗口（秒），与服务商按分钟计算的 RPM/TPM 限额一致
+USAGE_WINDOW = 60.0
+
+
+class LLMUnavailableError(Exception):
+    """重试次数用完或等待额度超时，LLM 暂时不可用"""
+
+    def __init__(self, message: str, rate_limited: bool = False):
+        super().__init__(message)
+        # 是否由限流（429 或额度用完）导致，调用方可据此提示稍后重试
+        self.rate_limited = rate_limited
+
+
+class SchedulerBusyError(LLMUnavailableError):
+    """所有端点在最长等待时间内都没有可用额度"""
+
+    def __init__(self, message: str):
+        super().__init__(message, rate_limited=True)
+
+
+class TokenBucket:
+    """
+    令牌桶：按固定速率补充令牌，桶满后不再增加。速率小于等于 0 时不限流。
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        距离桶内令牌足够 amount 还需等待的时间。超过桶容量的请求在桶满时即可放行。
+
+        :param amount: 需要的令牌数
+        :param now: 当前时间（time.monotonic）
+        :return: 等待秒数，0 表示可以立即放行
+        """
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        """取走令牌，按实际用量修正时 amount 可以为负数（退还）"""
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class Endpoint:
+    """
+    一个 OpenAI 兼容的 LLM 端点（地址 + key），带请求数和 token 数两个令牌桶以及并发上限。
+    """
+
+    def __init__(self, name: str, base_url: str, api_key: str, model: str,
+                 rpm: float = 0, tpm: float = 0, max_concurrency: int = 0):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+
+        # 限额按分钟给出，桶容量为一分钟的额度
+        self.request_bucket = TokenBucket(rpm / 60, rpm)
+        self.token_bucket = TokenBucket(tpm / 60, tpm)
+        self.inflight = 0
+        # 收到 429 后在此时间之前不再分配请求
+        self.cooldown_until = 0.0
+        # 最近一个统计窗口内的 (时间, 请求数, token 数)，用于计算利用率
+        self._usage = deque()
+        self._client = None
+
+        self.stats = {"requests": 0, "succeeded": 0, "rate_limited": 0, "server_errors": 0,
+                      "connection_errors": 0, "busy_seconds": 0.0}
+
+    @property
+    def client(self):
+        """AsyncOpenAI 客户端，首次使用时创建；重试由调度器负责，关闭 SDK 自带的重试"""
+        if self._client is None:
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._client
+
+    def wait_time(self, tokens: float, now: float) -> float:
+        """
+        距离可以向该端点发送请求还需等待的时间，并发已满时为无穷大。
+
+        :param tokens: 本次请求估算的 token 数
+        :param now: 当前时间（time.monotonic）
+        :return: 等待秒数
+        """
+        if self.max_concurrency and self.inflight >= self.max_concurrency:
+            return math.inf
+        return max(self.cooldown_until - now,
+                   self.request_bucket.wait_time(1, now),
+                   self.token_bucket.wait_time(tokens, now))
+
+    def load(self) -> float:
+        """当前负载：设置了并发上限时为占用比例，否则为处理中的请求数"""
+        if self.max_concurrency:
+            return self.inflight / self.max_concurrency
+        return float(self.inflight)
+
+    def start(self, tokens: float, now: float):
+        self.request_bucket.consume(1)
+        self.token_bucket.consume(tokens)
+        self.inflight += 1
+        self.stats["requests"] += 1
+        self._usage.append((now, 1, tokens))
+
+    def release(self, seconds: float, ok: bool):
+        self.inflight -= 1
+        self.stats["busy_seconds"] += seconds
+        if ok:
+            self.stats["succeeded"] += 1
+
+    def correct_tokens(self, delta: float):
+        """
+        按响应中的实际 token 用量修正估算值。
+
+        :param delta: 实际用量减去估算值
+        """
+        self.token_bucket.consume(delta)
+        self._usage.append((time.monotonic(), 0, delta))
+
+    def utilization(self, now: float = None) -> dict:
+        """
+        最近一分钟的请求数、token 数及其占限额的比例（未设置限额时比例为 None）。
+
+        :param now: 当前时间（time.monotonic）
+        :return: 利用率字典
+        """
+        now = time.monotonic() if now is None else now
+        while self._usage and now - self._usage[0][0] > USAGE_WINDOW:
+            self._usage.popleft()
+        requests = sum(count for _, count, _ in self._usage)
+        tokens = max(0.0, sum(amount for _, _, amount in self._usage))
+        return {
+            "requests_per_minute": requests,
+            "tokens_per_minute": round(tokens),
+            "rpm_utilization": requests / self.rpm if self.rpm else None,
+            "tpm_utilization": tokens / self.tpm if self.tpm else None,
+        }
+
+
+def _retry_after(error) -> float:
+    """读取 429 响应的 Retry-After 头（秒），没有或无法解析时返回 0"""
+    response = getattr(error, "response", None)
+    try:
+        return max(0.0, float(response.headers.get("retry-after", 0)))
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
+
+class LLMScheduler:
+    """
+    在多个 LLM 端点之间调度请求：优先选择无需等待额度的端点，其中负载最低者优先；
+    遇到 429、5xx 或连接错误时换端点重试，所有端点都失败过时按指数退避等待后重试。
+    """
+
+    def __init__(self, endpoints: list, max_retries: int = 3, backoff: float = 0.5,
+                 max_backoff: float = 8.0, max_wait: float = 30.0, expected_output_tokens: int = 256):
+        self.endpoints = endpoints
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # 等待额度的最长时间，超过后放弃请求
+        self.max_wait = max_wait
+        # 估算 token 数时为回复预留的数量，非流式请求完成后按实际用量修正
+        self.expected_output_tokens = expected_output_tokens
+
+        self.stats = {"retries": 0, "waits": 0, "wait_seconds": 0.0, "rejected": 0}
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        [API] 节为默认端点，每个 [Endpoint <名称>] 节增加一个端点，未填写的地址、key、模型沿用 [API] 的配置；
+        调度参数在 [Scheduler] 节。
+
+        :param config: AIApp 的 ConfigParser
+        :return: LLMScheduler 实例
+        """
+        def endpoint(name, section):
+            return Endpoint(
+                name,
+                base_url=config.get(section, 'base_url', fallback=config.get('API', 'base_url')),
+                api_key=config.get(section, 'api_key', fallback=config.get('API', 'api_key')),
+                model=config.get(section, 'model', fallback=config.get('API', 'model')),
+                rpm=config.getfloat(section, 'rpm', fallback=0),
+                tpm=config.getfloat(section, 'tpm', fallback=0),
+                max_concurrency=config.getint(section, 'max_concurrency', fallback=0),
+            )
+
+        endpoints = [endpoint('default', 'API')]
+        for section in config.sections():
+            if section.startswith('Endpoint '):
+                endpoints.append(endpoint(section[len('Endpoint '):], section))
+        return cls(
+            endpoints,
+            max_retries=config.getint('Scheduler', 'max_retries', fallback=3),
+            backoff=config.getfloat('Scheduler', 'retry_backoff', fallback=0.5),
+            max_backoff=config.getfloat('Scheduler', 'max_backoff', fallback=8.0),
+            max_wait=config.getfloat('Scheduler', 'max_wait', fallback=30.0),
+            expected_output_tokens=config.getint('Scheduler', 'expected_output_tokens', fallback=256),
+        )
+
+    async def _acquire(self, tokens: float, tried: set) -> Endpoint:
+        """
+        选择端点并占用额度：可立即发送的端点中负载最低者优先，都需要等待时等待最快可用的端点。
+        本次请求已失败过的端点只在没有其他端点时使用。
+        """
+        candidates = [endpoint for endpoint in self.endpoints if endpoint.name not in tried] or self.endpoints
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        waited = False
+        while True:
+            now = time.monotonic()
+            best = min(candidates, key=lambda endpoint: (endpoint.wait_time(tokens, now), endpoint.load()))
+            wait = best.wait_time(tokens, now)
+            if wait <= 0:
+                # 检查和占用之间没有 await，并发的请求不会超发额度
+                best.start(tokens, now)
+                if waited:
+                    self.stats["waits"] += 1
+                    self.stats["wait_seconds"] += now - start
+                    TRACER.observe("llm.queue_wait", now - start, endpoint=best.name)
+                return best
+            # 并发已满时不知道何时释放，一直检查到期限；额度不足时若期限内等不到则直接放弃
+            if now >= deadline or (not math.isinf(wait) and now + wait > deadline):
+                self.stats["rejected"] += 1
+                raise SchedulerBusyError(f"所有 LLM 端点在 {self.max_wait:.0f}s 内都没有可用额度")
+            waited = True
+            await asyncio.sleep(min(POLL_INTERVAL if math.isinf(wait) else wait, deadline - now))
+
+    def _retry_delay(self, endpoint: Endpoint, error: Exception, attempt: int, tried: set):
+        """
+        判断错误是否可重试并记录到端点统计。
+
+        :return: 重试前等待的秒数，不可重试时返回 None
+        """
+        import openai
+
+        if isinstance(error, openai.RateLimitError):
+            endpoint.stats["rate_limited"] += 1
+            cooldown = _retry_after(error) or self.backoff * 2 ** attempt
+            endpoint.cooldown_until = max(endpoint.cooldown_until, time.monotonic() + cooldown)
+        elif isinstance(error, openai.APIStatusError) and error.status_code >= 500:
+            endpoint.stats["server_errors"] += 1
+        elif isinstance(error, openai.APIConnectionError):
+            endpoint.stats["connection_errors"] += 1
+        else:
+            return None
+        # 还有没失败过的端点时立即换端点，否则退避（带随机抖动，避免重试集中到同一时刻）
+        if any(other.name not in tried for other in self.endpoints):
+            return 0.0
+        return min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    async def _create(self, tokens: float, kwargs: dict) -> tuple:
+        """
+        发送请求，失败时按重试策略换端点重试。
+
+        :return: (端点, 响应, 开始时间)
+        :raises LLMUnavailableError: 可重试的错误在重试次数用完后仍然出现，或等待额度超时
+        """
+        tried = set()
+        attempt = 0
+        while True:
+            endpoint = await self._acquire(tokens, tried)
+            start = time.monotonic()
+            try:
+                response = await endpoint.client.chat.completions.create(model=endpoint.model, **kwargs)
+            except BaseException as e:
+                endpoint.release(time.monotonic() - start, ok=False)
+                if not isinstance(e, Exception):
+                    raise
+                tried.add(endpoint.name)
+                delay = self._retry_delay(endpoint, e, attempt, tried)
+                if delay is None:
+                    raise
+                if attempt >= self.max_retries:
+                    raise LLMUnavailableError(
+                        f"LLM 请求重试 {attempt} 次后仍然失败: {e}",
+                        rate_limited=getattr(e, "status_code", None) == 429,
+                    ) from e
+                print(f"LLM 端点 {endpoint.name} 请求失败（{type(e).__name__}），第 {attempt + 1} 次重试")
+                attempt += 1
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+                continue
+            return endpoint, response, start
+
+    def estimate(self, prompt_tokens: float) -> float:
+        """本次请求估算的总 token 数（提示 + 预留的回复）"""
+        return prompt_tokens + self.expected_output_tokens
+
+    async def complete(self, prompt_tokens: float, **kwargs):
+        """
+        非流式请求。
+
+        :param prompt_tokens: 估算的提示 token 数
+        :param kwargs: chat.completions.create 的参数（model 由端点决定）
+        :return: ChatCompletion
+        :raises LLMUnavailableError: 重试次数用完或等待额度超时
+        """
+        tokens = self.estimate(prompt_tokens)
+        endpoint, completion, start = await self._create(tokens, kwargs)
+        endpoint.release(time.monotonic() - start, ok=True)
+        usage = getattr(completion, "usage", None)
+        if usage is not None and usage.total_tokens:
+            endpoint.correct_tokens(usage.total_tokens - tokens)
+        return completion
+
+    async def stream(self, prompt_tokens: float, **kwargs):
+        """
+        流式请求，逐个产出 ChatCompletionChunk。只有在收到第一个分块之前失败才会重试。
+
+        :param prompt_tokens: 估算的提示 token 数
+        :param kwargs: chat.completions.create 的参数（model 由端点决定）
+        """
+        endpoint, response, start = await self._create(self.estimate(prompt_tokens), kwargs)
+        ok = False
+        try:
+            async for chunk in response:
+                yield chunk
+            ok = True
+        finally:
+            endpoint.release(time.monotonic() - start, ok=ok)
+            if not ok:
+                await response.close()
+
+    def snapshot(self) -> dict:
+        """
+        各端点的利用率和统计。
+
+        :return: {"endpoints": {名称: {...}}, **调度统计}
+        """
+        now = time.monotonic()
+        return {
+            "endpoints": {
+                endpoint.name: {
+                    "base_url": endpoint.base_url,
+                    "model": endpoint.model,
+                    "inflight": endpoint.inflight,
+                    "cooling_down": endpoint.cooldown_until > now,
+                    **endpoint.utilization(now),
+                    **endpoint.stats,
+                }
+                for endpoint in self.endpoints
+            },
+            **self.stats,
+        }
+
+    def summary(self) -> str:
+        """
+        各端点利用率的文本报告。
+
+        :return: 报告文本
+        """
+        def ratio(value):
+            return "-" if value is None else f"{value:.0%}"
+
+        snapshot = self.snapshot()
+        lines = [f"LLM 调度：重试 {snapshot['retries']} 次，等待额度 {snapshot['waits']} 次"
+                 f"（共 {snapshot['wait_seconds']:.2f}s），超时放弃 {snapshot['rejected']} 次"]
+        for name, stats in snapshot["endpoints"].items():
+            lines.append(
+                f"  {name}: 处理中 {stats['inflight']}，最近一分钟 {stats['requests_per_minute']} 次请求"
+                f"（RPM {ratio(stats['rpm_utilization'])}）、{stats['tokens_per_minute']} tokens"
+                f"（TPM {ratio(stats['tpm_utilization'])}），成功 {stats['succeeded']}/{stats['requests']}，"
+                f"429 {stats['rate_limited']} 次，5xx {stats['server_errors']} 次，连接错误 {stats['connection_errors']} 次"
+                + ("，冷却中" if stats["cooling_down"] else "")
+            )
+        return "\n".join(lines)
@@ -1,21 +1,37 @@
 import asyncio
-from llm_model.ai_app import AIApp
-from typing import Optional, List, Dict
-from contextlib import AsyncExitStack
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
-from utills import format_available_tools, handle_tool_call
+import configparser
+import json
+import sys
+import time
+from collections import OrderedDict
+from llm_model.ai_app import AIApp, LLMRequestError
+from llm_model.scheduler import LLMUnavailableError
+from typing import Optional, List, Dict, TYPE_CHECKING
+from contextlib import AsyncExitStack, aclosing
+from utills import format_available_tools, handle_tool_call, StreamToolCallAssembler, canonical_tool_call, dedupe_tool_calls, \
+    fit_tool_results
+from tool_manifest import ToolManifest, server_fingerprint
+from tool_index import ToolIndex
+from fast_path import FastPath
+from tracing import TRACER, current_trace_id, to_prometheus
+from resilience import CircuitBreaker, CircuitOpenError, LatencyTracker
+
+# mcp 导入较慢，在首次连接服务器时才导入；懒启动的服务器未被调用前不需要导入
+if TYPE_CHECKING:
+    from mcp import ClientSession, StdioServerParameters, types
 
 
 class MCPClient:
-    def __init__(self, llm: AIApp, server_script_path: list[str]):
+    def __init__(self, llm: AIApp, server_script_path: list[str], config_file: str = None):
         # 初始化对话 LLM
         self.llm_app = llm
 
-        # 用于管理异步上下文的退出栈
-        self.exit_stack = AsyncExitStack()
+        # 客户端配置，未提供配置文件时全部使用默认值
+        self.config = configparser.ConfigParser()
+        if config_file:
+            self.config.read(config_file, encoding='utf-8')
 
-        # MCP 客户端会话，以字典形式存储不同服务器的会话信息
+        # MCP 客户端会话，以字典形式存储不同服务器的副本池（replicas）及进行中请求数
         self.mcp_session = {}
 
         # MCP 服务器脚本路径
@@ -27,14 +43,92 @@ class MCPClient:
         # tool 与 server 的映射
         self.tool_map = {}
 
-    def get_server_parameters(self, path) -> StdioServerParameters:
+        # 每个 server 各副本的后台任务及其停止信号，副本的上下文在各自的任务中进入和退出
+        self.server_tasks = {}
+
+        # 每个 server 的启动耗时和状态
+        self.startup_report = {}
+
+        # 每个 server 提供的工具（格式化后），available_tools 由它按 server 顺序汇总
+        self.server_tools = {}
+
+        # 按需启动时防止同一 server 被重复启动
+        self.spawn_locks = {}
+
+        # 空闲 server 回收任务
+        self.idle_task = None
+
+        # 根据工具清单预先登记工具后，在后台启动并校验的任务
+        self.background_tasks = []
+
+        # 阶段耗时追踪，开启后 trace id 会随工具调用传给 MCP 服务器
+        TRACER.enabled = self.config.getboolean('Tracing', 'ENABLED', fallback=TRACER.enabled)
+
+        # 每个 server 的熔断器
+        self.breakers = {}
+
+        # 每个工具最近的调用耗时，用于计算对冲请求的触发时间
+        self.tool_latency = {}
+
+        # 最近的成功调用结果（规范化调用 -> 结果），熔断时作为降级结果
+        self.last_results = OrderedDict()
+
+        # 工具的 BM25 索引，每次查询只携带最相关的 TOOL_TOP_K 个工具
+        self.tool_index = ToolIndex()
+        self.tool_selection_stats = {"queries": 0, "sent": 0, "total": 0, "called": 0, "missed": 0, "fallbacks": 0,
+                                     "unmatched": 0}
+
+        # 单个工具调用的快速回答规则，命中时跳过第二次 LLM 调用
+        self.fast_path = FastPath.from_config(self.config)
+
+        # 同一轮工具调用的去重统计：模型给出的调用数和实际执行数
+        self.dedup_stats = {"calls": 0, "executed": 0}
+
+        # 交互式查询最近的首段输出时间和总耗时，不依赖 [Tracing] 是否开启
+        self.query_latency = {"ttft": LatencyTracker(min_samples=1), "total": LatencyTracker(min_samples=1)}
+
+        # 本地持久化的工具清单，重启时先用它向 LLM 公布工具，再与实际启动的服务器校验
+        self.manifest = ToolManifest(self.config.get('MCPClient', 'MANIFEST_PATH', fallback='.mcp_tool_manifest.json'))
+
+    def get_server_option(self, server_name, option, fallback=None, getter='get'):
+        """
+        读取服务器配置，优先使用 [Server <服务器名称>] 节，其次使用 [MCPClient] 节。
+
+        :param server_name: 服务器名称
+        :param option: 配置项名称
+        :param fallback: 两个节都没有配置时的默认值
+        :param getter: ConfigParser 的读取方法名，如 get、getint、getfloat、getboolean
+        :return: 配置值
+        """
+        read = getattr(self.config, getter)
+        section = f"Server {server_name}"
+        if self.config.has_option(section, option):
+            return read(section, option)
+        return read('MCPClient', option, fallback=fallback)
+
+    @staticmethod
+    def is_remote(path) -> bool:
+        """
+        是否为已运行的 MCP 服务器地址（SSE 传输），而不是需要启动的脚本。
+
+        :param path: 服务器脚本文件路径或地址
+        """
+        return path.startswith(('http://', 'https://'))
+
+    def get_server_parameters(self, path) -> "StdioServerParameters | str":
         """
         根据服务器脚本文件类型生成启动服务器所需的参数。
 
-        :param path: 服务器脚本文件路径
-        :return: 包含服务器启动命令和参数的 StdioServerParameters 对象
+        :param path: 服务器脚本文件路径，或 http(s):// 开头的 SSE 服务器地址
+        :return: 包含服务器启动命令和参数的 StdioServerParameters 对象，地址则原样返回
         :raises ValueError: 如果脚本文件类型不是 .py 或 .jar
         """
+        if self.is_remote(path):
+            return path
+
+        from mcp import StdioServerParameters
+        from mcp.client.stdio import get_default_environment
+
         if path.endswith('.py'):
             command = "python"
             args = [path]
@@ -49,43 +143,455 @@ class MCPClient:
         else:
             raise ValueError("不支持的脚本文件类型，仅支持 .py 或 .jar 文件")
 
-        return StdioServerParameters(command=command, args=args, env=None)
+        # 额外的环境变量，每行一个 KEY=VALUE，未配置时使用 MCP 默认环境
+        env = None
+        extra_env = self.get_server_option(path, 'ENV', fallback='')
+        if extra_env.strip():
+            env = get_default_environment()
+            for line in extra_env.strip().splitlines():
+                key, _, value = line.partition('=')
+                env[key.strip()] = value.strip()
+
+        return StdioServerParameters(command=command, args=args, env=env)
 
-    async def connect_to_mcp_server(self, server_name, path):
+    async def connect_to_mcp_server(self, server_name, path, exit_stack: AsyncExitStack, replica: int = 0) -> dict:
         """
         连接到 MCP 服务器，启动服务器并列出可用工具，将工具注入到 LLM 中。
 
         :param server_name: 服务器名称
-        :param path: 服务器脚本文件路径
+        :param path: 服务器脚本文件路径，或 http(s):// 开头的 SSE 服务器地址
+        :param exit_stack: 管理服务器上下文的退出栈，由副本所在的任务持有，任务结束时关闭
+        :param replica: 副本序号，同一 server 可以启动多个进程分担工具调用
+        :return: 启动各阶段耗时（秒），包括 spawn、initialize、list_tools
         """
+        from mcp import ClientSession
+        from mcp.client.sse import sse_client
+        from mcp.client.stdio import stdio_client
+
+        timings = {}
+
         # 获取服务器启动参数
         server_params = self.get_server_parameters(path)
 
-        # 启动 MCP 服务器并获取输入输出流
-        stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
-        stdio, write = stdio_transport
+        # 启动 MCP 服务器（或连接到已运行的 SSE 服务器）并获取输入输出流
+        start = time.perf_counter()
+        if self.is_remote(path):
+            transport = sse_client(
+                server_params,
+                timeout=self.get_server_option(path, 'CONNECT_TIMEOUT', fallback=5, getter='getfloat'),
+                sse_read_timeout=self.get_server_option(path, 'SSE_READ_TIMEOUT', fallback=300, getter='getfloat'),
+            )
+        else:
+            transport = stdio_client(server_params)
+        stdio, write = await exit_stack.enter_async_context(transport)
+        timings["spawn"] = time.perf_counter() - start
 
         # 初始化 MCP 客户端会话
-        session = await self.exit_stack.enter_async_context(ClientSession(stdio, write))
+        start = time.perf_counter()
+        session = await exit_stack.enter_async_context(ClientSession(stdio, write))
         await session.initialize()
-
-        # 把当前 server 的 session 加入到字典，便于后续根据tool寻找server
-        self.mcp_session[server_name] = {"session": session, "stdio": stdio, "write": write}
+        timings["initialize"] = time.perf_counter() - start
 
         # 列出 MCP 服务器上的工具
+        start = time.perf_counter()
         mcp_response = await session.list_tools()
+        timings["list_tools"] = time.perf_counter() - start
         tools = mcp_response.tools
-        print(f"已连接 MCP 服务器{server_name}，支持以下工具：\n", [tool.name for tool in tools])
+        replica_label = f"（副本 {replica}）" if replica else ""
+        print(f"已连接 MCP 服务器{server_name}{replica_label}，支持以下工具：\n", [tool.name for tool in tools])
+
+        # 把当前 server 的 session 加入到副本池，便于后续根据tool寻找server
+        server = self.mcp_session.setdefault(server_name, {"replicas": [], "inflight": 0, "last_used": time.monotonic()})
+        server["replicas"].append({
+            "session": session, "stdio": stdio, "write": write,
+            "replica": replica, "inflight": 0, "exit_stack": exit_stack
+        })
 
-        # 格式化可用工具
+        # 格式化可用工具并构建 tool 与 server 的映射，多个副本只需登记一次
         format_tools = format_available_tools(mcp_response)
-        for format_tool in format_tools:
-            self.available_tools.append(format_tool)
+        previous_tools = self.server_tools.get(server_name)
+        if previous_tools != format_tools:
+            self.register_tools(server_name, format_tools)
+            if previous_tools is not None:
+                print(f"MCP 服务器 {server_name} 的工具与清单不一致，已按实际工具更新")
+        self.manifest.put(server_name, self.get_server_fingerprint(server_name, path), format_tools)
+
+        return timings
+
+    def get_server_fingerprint(self, server_name, path) -> str:
+        """
+        计算服务器指纹，用于判断工具清单是否仍然有效。
+
+        :param server_name: 服务器名称
+        :param path: 服务器脚本文件路径
+        :return: 指纹字符串
+        """
+        if self.is_remote(path):
+            return server_fingerprint(path, "sse", [path])
+        server_params = self.get_server_parameters(path)
+        use_hash = self.get_server_option(server_name, 'MANIFEST_HASH', fallback=False, getter='getboolean')
+        return server_fingerprint(path, server_params.command, server_params.args, use_hash)
+
+    def register_tools(self, server_name, format_tools: list):
+        """
+        登记 server 提供的工具，重复登记同一 server 时替换其旧工具。
+        available_tools 原地更新，已注入 LLM 的工具列表会同步变化。
+
+        :param server_name: 服务器名称
+        :param format_tools: format_available_tools 格式化后的工具列表
+        """
+        self.server_tools[server_name] = format_tools
+        self.available_tools[:] = [tool for tools in self.server_tools.values() for tool in tools]
+        self.tool_map.clear()
+        for name, tools in self.server_tools.items():
+            for tool in tools:
+                self.tool_map[tool["function"]["name"]] = name
+        self.tool_index.build(self.available_tools)
+
+    def is_lazy(self, server_name) -> bool:
+        """
+        是否为懒启动的 server：首次调用其工具时才启动，空闲超时后关闭。
 
-        # 构建 tool 与 server 的映射
-        for tool in tools:
-            self.tool_map[tool.name] = server_name
+        :param server_name: 服务器名称
+        """
+        return self.get_server_option(server_name, 'LAZY_START', fallback=False, getter='getboolean')
 
+    async def _serve_mcp_server(self, server_name, path, replica: int, ready: asyncio.Future, stop: asyncio.Event):
+        """
+        在独立任务中连接并持有一个 MCP 服务器副本，直到收到停止信号。
+        stdio_client 内部使用 anyio 任务组，必须在同一个任务中进入和退出，因此每个副本独占一个任务。
+
+        :param server_name: 服务器名称
+        :param path: 服务器脚本文件路径
+        :param replica: 副本序号
+        :param ready: 连接完成后写入启动耗时，失败时写入异常
+        :param stop: 停止信号
+        """
+        async with AsyncExitStack() as exit_stack:
+            try:
+                try:
+                    timings = await self.connect_to_mcp_server(server_name, path, exit_stack, replica)
+                except Exception as e:
+                    if not ready.done():
+                        ready.set_exception(e)
+                    return
+                if not ready.done():
+                    ready.set_result(timings)
+                await stop.wait()
+            finally:
+                self._remove_replica(server_name, exit_stack)
+
+    def _remove_replica(self, server_name, exit_stack: AsyncExitStack):
+        """
+        从副本池移除即将关闭的副本，副本全部移除后删除该 server 的会话记录。
+
+        :param server_name: 服务器名称
+        :param exit_stack: 副本所在任务的退出栈，用于识别副本
+        """
+        server = self.mcp_session.get(server_name)
+        if server is None:
+            return
+        server["replicas"] = [r for r in server["replicas"] if r["exit_stack"] is not exit_stack]
+        if not server["replicas"]:
+            self.mcp_session.pop(server_name, None)
+
+    async def start_mcp_server(self, server_name, path):
+        """
+        启动并连接一个 MCP 服务器的全部副本，超时或失败时记录原因，不影响其他服务器。
+        只要有一个副本启动成功即视为可用。
+
+        :param server_name: 服务器名称
+        :param path: 服务器脚本文件路径
+        :return: 是否连接成功
+        """
+        timeout = self.get_server_option(server_name, 'STARTUP_TIMEOUT', fallback=60, getter='getfloat')
+        replicas = max(1, self.get_server_option(server_name, 'REPLICAS', fallback=1, getter='getint'))
+        loop = asyncio.get_running_loop()
+
+        launches = []
+        for replica in range(replicas):
+            ready = loop.create_future()
+            stop = asyncio.Event()
+            task = asyncio.create_task(self._serve_mcp_server(server_name, path, replica, ready, stop))
+            launches.append((task, stop, ready))
+
+        start = time.perf_counter()
+        try:
+            outcomes = await asyncio.gather(
+                *(asyncio.wait_for(asyncio.shield(ready), timeout) for _, _, ready in launches),
+                return_exceptions=True
+            )
+        except asyncio.CancelledError:
+            for task, _, _ in launches:
+                task.cancel()
+            await asyncio.gather(*(task for task, _, _ in launches), return_exceptions=True)
+            raise
+
+        started = []
+        timings = None
+        errors = []
+        for (task, stop, _), outcome in zip(launches, outcomes):
+            if isinstance(outcome, BaseException):
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                if isinstance(outcome, asyncio.TimeoutError):
+                    errors.append(f"启动超时（{timeout}s）")
+                else:
+                    errors.append(str(outcome) or type(outcome).__name__)
+            else:
+                started.append((task, stop))
+                timings = timings or outcome
+
+        if not started:
+            self.startup_report[server_name] = {"status": "failed", "error": errors[0],
+                                                "total": time.perf_counter() - start}
+            print(f"MCP 服务器 {server_name} 启动失败: {errors[0]}")
+            return False
+        if errors:
+            print(f"MCP 服务器 {server_name} 有 {len(errors)} 个副本启动失败: {errors[0]}")
+
+        self.server_tasks[server_name] = started
+        self.startup_report[server_name] = {"status": "ok", **timings, "replicas": len(started),
+                                            "total": time.perf_counter() - start}
+        return True
+
+    async def stop_mcp_server(self, server_name):
+        """
+        关闭一个 MCP 服务器的全部副本，之后调用其工具时会重新启动。
+
+        :param server_name: 服务器名称
+        """
+        lock = self.spawn_locks.setdefault(server_name, asyncio.Lock())
+        async with lock:
+            self.mcp_session.pop(server_name, None)
+            launches = self.server_tasks.pop(server_name, [])
+            for task, stop in launches:
+                stop.set()
+            await asyncio.gather(*(task for task, _ in launches), return_exceptions=True)
+
+    async def acquire_replica(self, server_name) -> dict:
+        """
+        获取 server 中进行中请求最少的副本，server 未运行时按需启动。
+
+        :param server_name: 服务器名称
+        :return: 副本信息，包含 session
+        :raises RuntimeError: server 启动失败
+        """
+        if server_name not in self.mcp_session:
+            print(f"等待 MCP 服务器 {server_name} 就绪")
+            if not await self.ensure_server(server_name):
+                raise RuntimeError(f"MCP 服务器 {server_name} 启动失败")
+        return min(self.mcp_session[server_name]["replicas"], key=lambda r: r["inflight"])
+
+    async def ensure_server(self, server_name) -> bool:
+        """
+        确保 server 正在运行，正在启动中时等待其完成，不会重复启动。
+
+        :param server_name: 服务器名称
+        :return: server 是否可用
+        """
+        if server_name in self.mcp_session:
+            return True
+        lock = self.spawn_locks.setdefault(server_name, asyncio.Lock())
+        async with lock:
+            if server_name in self.mcp_session:
+                return True
+            return await self.start_mcp_server(server_name, server_name)
+
+    async def _verify_server(self, server_name):
+        """
+        后台启动已按清单登记工具的 server，连接后用实际工具校正 tool_map 和清单。
+
+        :param server_name: 服务器名称
+        """
+        if await self.ensure_server(server_name):
+            report = self.startup_report[server_name]
+            print(f"MCP 服务器 {server_name} 后台启动完成，耗时 {report['total']:.2f}s")
+
+    def get_tool_option(self, tool_name, server_name, option, fallback=None, getter='get'):
+        """
+        读取工具相关配置，优先级：[Tool <工具名>] 节 > [Server <服务器名称>] 节 > [MCPClient] 节。
+
+        :param tool_name: 工具名称
+        :param server_name: 服务器名称
+        :param option: 配置项名称
+        :param fallback: 默认值
+        :param getter: ConfigParser 的读取方法名
+        :return: 配置值
+        """
+        section = f"Tool {tool_name}"
+        if self.config.has_option(section, option):
+            return getattr(self.config, getter)(section, option)
+        return self.get_server_option(server_name, option, fallback=fallback, getter=getter)
+
+    def get_breaker(self, server_name) -> CircuitBreaker:
+        breaker = self.breakers.get(server_name)
+        if breaker is None:
+            breaker = self.breakers[server_name] = CircuitBreaker(
+                self.get_server_option(server_name, 'BREAKER_THRESHOLD', fallback=5, getter='getint'),
+                self.get_server_option(server_name, 'BREAKER_COOLDOWN', fallback=30, getter='getfloat'),
+            )
+        return breaker
+
+    async def call_tool(self, tool_name, args):
+        """
+        调用工具：受截止时间约束，可选对冲请求；server 持续失败时熔断，熔断期间返回最近一次相同调用的缓存结果。
+
+        :param tool_name: 工具名称
+        :param args: 工具参数
+        :return: 工具调用结果
+        :raises CircuitOpenError: 熔断中且没有可用的缓存结果
+        """
+        server_name = self.tool_map.get(tool_name)
+        if server_name is None:
+            raise ValueError(f"未找到提供工具 {tool_name} 的 MCP 服务器")
+
+        call_key = canonical_tool_call({"name": tool_name, "args": args})
+        breaker = self.get_breaker(server_name)
+        if not breaker.allow():
+            return self._degraded_result(call_key, f"MCP 服务器 {server_name} 熔断中")
+
+        timeout = self.get_tool_option(tool_name, server_name, 'TOOL_TIMEOUT', fallback=30, getter='getfloat')
+        with TRACER.span("tool.call", tool=tool_name):
+            try:
+                call = self._call_tool_hedged(server_name, tool_name, args)
+                result = await (asyncio.wait_for(call, timeout) if timeout > 0 else call)
+            except asyncio.TimeoutError:
+                breaker.record_failure()
+                raise TimeoutError(f"工具 {tool_name} 调用超时（{timeout}s）")
+            except Exception:
+                breaker.record_failure()
+                raise
+
+        # 工具返回 isError（如地点不存在、参数错误）说明服务器正常响应，不计入熔断失败，但不作为降级时的缓存结果
+        breaker.record_success()
+        if not result.isError:
+            self.last_results[call_key] = result
+            self.last_results.move_to_end(call_key)
+            while len(self.last_results) > 256:
+                self.last_results.popitem(last=False)
+        return result
+
+    def _degraded_result(self, call_key, reason) -> "types.CallToolResult":
+        """
+        熔断时的降级结果：返回最近一次相同调用的成功结果并注明，没有时抛出异常。
+
+        :param call_key: 规范化的工具调用
+        :param reason: 熔断原因
+        :return: 标注为缓存的工具调用结果
+        """
+        from mcp import types
+
+        cached = self.last_results.get(call_key)
+        if cached is None or not cached.content or not hasattr(cached.content[0], 'text'):
+            raise CircuitOpenError(reason)
+        return types.CallToolResult(content=[
+            types.TextContent(type="text", text=f"（{reason}，以下为之前的结果，可能已过期）\n{cached.content[0].text}")
+        ])
+
+    async def _call_tool_hedged(self, server_name, tool_name, args) -> "types.CallToolResult":
+        """
+        开启对冲时，请求耗时超过该工具历史耗时的指定百分位仍未返回，则再发送一次相同请求（优先落到其他副本），
+        取先成功的结果并取消另一个。
+
+        :param server_name: 服务器名称
+        :param tool_name: 工具名称
+        :param args: 工具参数
+        :return: 工具调用结果
+        """
+        latency = self.tool_latency.setdefault(tool_name, LatencyTracker())
+        hedge_delay = None
+        if self.get_tool_option(tool_name, server_name, 'HEDGE', fallback=False, getter='getboolean'):
+            hedge_delay = latency.percentile(
+                self.get_tool_option(tool_name, server_name, 'HEDGE_PERCENTILE', fallback=95, getter='getfloat')
+            )
+
+        start = time.perf_counter()
+        if hedge_delay is None:
+            result = await self._call_replica(server_name, tool_name, args)
+            latency.record(time.perf_counter() - start)
+            return result
+
+        pending = {asyncio.create_task(self._call_replica(server_name, tool_name, args))}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+            if not done:
+                pending.add(asyncio.create_task(self._call_replica(server_name, tool_name, args)))
+            error = None
+            while done or pending:
+                for task in done:
+                    if task.exception() is None:
+                        latency.record(time.perf_counter() - start)
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _call_replica(self, server_name, tool_name, args) -> "types.CallToolResult":
+        """
+        在进行中请求最少的副本上执行一次工具调用，记录进行中请求数和最近使用时间，供路由和空闲回收判断。
+
+        :param server_name: 服务器名称
+        :param tool_name: 工具名称
+        :param args: 工具参数
+        :return: 工具调用结果
+        """
+        # 按最少进行中请求选择副本，同一工具的并发调用可以分散到多个进程
+        replica = await self.acquire_replica(server_name)
+        server = self.mcp_session[server_name]
+        replica["inflight"] += 1
+        server["inflight"] += 1
+        try:
+            return await self._send_call_tool(replica["session"], tool_name, args)
+        finally:
+            replica["inflight"] -= 1
+            server["inflight"] -= 1
+            server["last_used"] = time.monotonic()
+
+    @staticmethod
+    async def _send_call_tool(session: "ClientSession", tool_name, args) -> "types.CallToolResult":
+        """
+        发送 tools/call 请求，存在 trace id 时通过 _meta.traceId 传给服务器。
+
+        :param session: 副本会话
+        :param tool_name: 工具名称
+        :param args: 工具参数
+        :return: 工具调用结果
+        """
+        from mcp import types
+
+        trace_id = current_trace_id.get()
+        if trace_id is None:
+            return await session.call_tool(tool_name, args)
+        params = types.CallToolRequestParams(
+            name=tool_name, arguments=args, _meta=types.RequestParams.Meta(traceId=trace_id)
+        )
+        return await session.send_request(
+            types.ClientRequest(types.CallToolRequest(method="tools/call", params=params)),
+            types.CallToolResult,
+        )
+
+    async def _reap_idle_servers(self, interval: float):
+        """
+        定期关闭空闲超时的懒启动 server。
+
+        :param interval: 检查间隔（秒）
+        """
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for server_name, server in list(self.mcp_session.items()):
+                if not self.is_lazy(server_name) or server["inflight"] > 0:
+                    continue
+                idle_timeout = self.get_server_option(server_name, 'IDLE_TIMEOUT', fallback=300, getter='getfloat')
+                if 0 < idle_timeout < now - server["last_used"]:
+                    print(f"MCP 服务器 {server_name} 空闲超过 {idle_timeout}s，已关闭")
+                    await self.stop_mcp_server(server_name)
 
     def set_llm_tools(self):
         """
@@ -94,63 +600,302 @@ class MCPClient:
         if self.available_tools:
             self.llm_app.set_tools(self.available_tools)
 
-    async def process_query(self, query: str) -> str:
+    def select_tools(self, query: str) -> Optional[List[Dict]]:
+        """
+        按 BM25 相关度为查询挑选最多 TOOL_TOP_K 个工具，减少每次请求携带的工具定义，并记录本次携带的工具数。
+        没有任何相关工具时（多为不需要工具的闲聊）只携带前 TOOL_TOP_K 个工具，不回退到全部工具。
+
+        :param query: 用户输入的查询语句
+        :return: 挑选出的工具列表；工具总数不超过 TOOL_TOP_K 或未开启筛选时返回 None，表示携带全部工具
+        """
+        total = len(self.available_tools)
+        stats = self.tool_selection_stats
+        stats["queries"] += 1
+        stats["total"] += total
+
+        top_k = self.config.getint('MCPClient', 'TOOL_TOP_K', fallback=0)
+        if top_k <= 0 or total <= top_k:
+            stats["sent"] += total
+            return None
+        selected = [tool for _, tool in self.tool_index.search(query, top_k)]
+        if not selected:
+            # 空的工具列表部分接口不接受，也会让 BM25 漏掉的查询无法调用工具，因此仍携带 TOOL_TOP_K 个
+            stats["unmatched"] += 1
+            selected = self.available_tools[:top_k]
+        stats["sent"] += len(selected)
+        return selected
+
+    def record_tool_selection(self, tools: Optional[List[Dict]], tool_calls: List[Dict]):
+        """
+        记录工具筛选的召回情况，模型调用了未被选中的工具时打印提示；携带的工具数在 select_tools 中记录。
+
+        :param tools: 本次携带的工具，None 表示全部工具
+        :param tool_calls: 模型实际给出的工具调用
+        """
+        total = len(self.available_tools)
+        sent = len(tools) if tools is not None else total
+        called_names = {tool_call["name"] for tool_call in tool_calls}
+        missed = called_names - {tool["function"]["name"] for tool in tools} if tools is not None else set()
+        stats = self.tool_selection_stats
+        stats["called"] += len(called_names)
+        stats["missed"] += len(missed)
+        if missed:
+            print(f"工具筛选未召回: {sorted(missed)}（本次携带 {sent}/{total} 个工具）")
+
+    def tool_selection_summary(self) -> str:
+        """
+        工具筛选的累计统计：平均携带的工具比例（含回退全部工具的重新请求），以及模型调用的工具中被选中的比例（召回率）。
+
+        :return: 统计文本
+        """
+        stats = self.tool_selection_stats
+        if not stats["queries"]:
+            return "工具筛选：暂无查询"
+        sent_ratio = stats["sent"] / stats["total"] if stats["total"] else 1.0
+        recall = 1 - stats["missed"] / stats["called"] if stats["called"] else 1.0
+        return (f"工具筛选：{stats['queries']} 次查询，平均携带 {stats['sent'] / stats['queries']:.1f}/"
+                f"{stats['total'] / stats['queries']:.1f} 个工具（{sent_ratio:.0%}），召回率 {recall:.0%}，"
+                f"无相关工具 {stats['unmatched']} 次，回退全部工具 {stats['fallbacks']} 次")
+
+    def query_latency_summary(self) -> str:
+        """
+        交互式查询的耗时统计：最近查询首段输出时间和总耗时的 p50、p95。
+
+        :return: 统计文本
+        """
+        total = self.query_latency["total"]
+        if not total.samples:
+            return "查询耗时：暂无查询"
+        parts = []
+        for name, label in (("ttft", "首段输出"), ("total", "总耗时")):
+            tracker = self.query_latency[name]
+            if tracker.samples:
+                parts.append(f"{label} p50 {tracker.percentile(50):.2f}s / p95 {tracker.percentile(95):.2f}s")
+        return f"查询耗时：最近 {len(total.samples)} 次查询，" + "，".join(parts)
+
+    def needs_all_tools(self, tools: Optional[List[Dict]], tool_calls: List[Dict]) -> bool:
+        """
+        模型调用了不存在的工具，说明筛选可能漏掉了需要的工具，此时应携带全部工具重新请求。
+
+        :param tools: 本次携带的工具，None 表示全部工具
+        :param tool_calls: 模型给出的工具调用
+        :return: 是否需要回退到全部工具
+        """
+        unknown = sorted({tool_call["name"] for tool_call in tool_calls} - set(self.tool_map))
+        if tools is None or not unknown:
+            return False
+        self.tool_selection_stats["fallbacks"] += 1
+        self.tool_selection_stats["sent"] += len(self.available_tools)
+        print(f"模型请求了未提供的工具 {unknown}，改为携带全部工具重新请求")
+        return True
+
+    async def process_query(self, query: str, timings: Optional[Dict] = None):
         """
         处理用户输入的查询，若 LLM 需要调用 MCP 服务器工具，则并发执行工具调用并整合结果。
+        回答以异步生成器逐段产出，调用方可以边接收边输出，不必等待完整回答。
+
+        :param query: 用户输入的查询语句
+        :param timings: 可选，传入的字典会写入本次查询的首段输出时间 ttft 和总耗时 total（秒）
+        :return: 逐段产出回答文本的异步迭代器
+        :raises LLMRequestError: LLM 调用失败或没有生成任何回答
+        """
+        start = time.perf_counter()
+        ttft = None
+        try:
+            with TRACER.trace(), TRACER.span("query", stream=self.llm_app.stream):
+                tools = self.select_tools(query)
+                if self.llm_app.stream:
+                    answer = self._process_query_stream(query, tools)
+                else:
+                    answer = self._process_query_non_stream(query, tools)
+                async for text in answer:
+                    if not text:
+                        continue
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                        TRACER.observe("query.ttft", ttft, stream=self.llm_app.stream)
+                    yield text
+                if ttft is None:
+                    # 空回答不能当作成功，否则批量任务会记为完成、HTTP 接口会返回 200
+                    raise LLMRequestError("模型没有生成任何回答")
+        finally:
+            if timings is not None:
+                timings["ttft"] = ttft
+                timings["total"] = time.perf_counter() - start
+
+    async def answer_query(self, query: str, timings: Optional[Dict] = None) -> str:
+        """
+        处理查询并返回完整回答文本，适合不需要逐段输出的调用方。
+
+        :param query: 用户输入的查询语句
+        :param timings: 同 process_query
+        :return: 完整回答文本
+        """
+        async with aclosing(self.process_query(query, timings)) as answer:
+            return "".join([text async for text in answer])
+
+    async def _process_query_non_stream(self, query: str, tools: Optional[List[Dict]] = None):
+        """
+        非流式模式下处理查询：第一次 LLM 调用非流式获取工具调用，第二次总结回答流式输出。
+        不需要调用工具时，第一次调用的回答只能完整返回后一次性输出；需要逐段输出时请开启 stream。
 
         :param query: 用户输入的查询语句
-        :return: 处理后的响应文本
+        :param tools: 本次携带的工具，None 表示全部工具
+        :return: 逐段产出回答文本的异步迭代器
         """
-        # 向 LLM 发送查询并获取响应
-        response = self.llm_app.generate_response(prompt_index=1, user_input=query)
+        # 向 LLM 发送查询并获取响应（异步调用，不阻塞事件循环中的其他查询和 MCP 会话）
+        response = await self.llm_app.agenerate_response(prompt_index=1, user_input=query, tools=tools)
         content = response.choices[0]
 
-        # 如果 LLM 需要调用 MCP 服务器工具
-        if content.finish_reason == "tool_calls":
-            # 解析所有工具调用
-            tool_calls = handle_tool_call(content)
+        # LLM 不需要调用工具，直接返回回复
+        if content.finish_reason != "tool_calls":
+            yield content.message.content
+            return
+
+        # 解析所有工具调用
+        tool_calls = handle_tool_call(content)
+        if self.needs_all_tools(tools, tool_calls):
+            async for text in self._process_query_non_stream(query):
+                yield text
+            return
+        self.record_tool_selection(tools, tool_calls)
+
+        # 并发执行所有工具调用
+        tool_results = await self.run_tools_concurrently(tool_calls)
+        # print(tool_results)
+
+        async for text in self._answer_with_tool_results(query, tool_calls, tool_results, tools):
+            yield text
+
+    async def _process_query_stream(self, query: str, tools: Optional[List[Dict]] = None):
+        """
+        流式模式下处理查询：边接收模型输出边拼装工具调用，每个工具调用参数完整后立即执行，
+        使工具耗时与模型剩余输出时间重叠，而不是等到 finish_reason == "tool_calls" 才开始。
+
+        :param query: 用户输入的查询语句
+        :param tools: 本次携带的工具，None 表示全部工具
+        :return: 逐段产出回答文本的异步迭代器
+        """
+        assembler = StreamToolCallAssembler()
+        tool_calls = []
+        tool_tasks = []
+        # 规范化的工具调用 -> 执行任务，重复的调用复用同一个任务
+        dispatched = {}
+
+        def dispatch(tool_call):
+            tool_calls.append(tool_call)
+            # 不存在的工具不执行，流结束后携带全部工具重新请求
+            if tools is not None and tool_call["name"] not in self.tool_map:
+                return
+            key = canonical_tool_call(tool_call)
+            if key not in dispatched:
+                dispatched[key] = asyncio.create_task(self.run_tools_concurrently([tool_call], dedupe=False))
+            tool_tasks.append(dispatched[key])
+
+        try:
+            async for chunk in self.llm_app.astream_chunks(prompt_index=1, user_input=query, tools=tools):
+                # 模型直接回答的内容立即输出
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                for tool_call in assembler.feed(chunk):
+                    dispatch(tool_call)
 
-            # 并发执行所有工具调用
-            tool_results = await self.run_tools_concurrently(tool_calls)
-            # print(tool_results)
+            for tool_call in assembler.finish():
+                dispatch(tool_call)
+        except BaseException:
+            # 调用方提前停止或出错时，取消已经开始的工具调用
+            for task in dispatched.values():
+                task.cancel()
+            raise
 
-            # 将工具调用结果和初始查询重新发送给 LLM
-            response = self.llm_app.generate_response(
+        # 模型不需要调用工具，回复已经输出完毕
+        if not assembler.has_tool_calls:
+            return
+
+        if self.needs_all_tools(tools, tool_calls):
+            for task in dispatched.values():
+                task.cancel()
+            await asyncio.gather(*dispatched.values(), return_exceptions=True)
+            async for text in self._process_query_stream(query):
+                yield text
+            return
+        self.record_tool_selection(tools, tool_calls)
+        self.record_dedup(len(tool_tasks), len(dispatched))
+
+        # 按调用顺序汇总各工具结果
+        tool_results = []
+        for results in await asyncio.gather(*tool_tasks):
+            tool_results.extend(results)
+
+        async for text in self._answer_with_tool_results(query, tool_calls, tool_results, tools):
+            yield text
+
+    async def _answer_with_tool_results(self, query: str, tool_calls: List[Dict], tool_results: List[str],
+                                        tools: Optional[List[Dict]]):
+        """
+        根据工具结果生成最终回答：命中快速回答模板时直接输出，否则将工具结果和原问题发送给 LLM 流式总结。
+
+        :param query: 用户输入的查询语句
+        :param tool_calls: 模型给出的工具调用
+        :param tool_results: 工具返回的文本
+        :param tools: 本次携带的工具，None 表示全部工具
+        :return: 逐段产出回答文本的异步迭代器
+        """
+        # 简单的单工具查询直接按模板回答
+        answer = self.fast_path.render(tool_calls, tool_results)
+        if answer is not None:
+            yield answer
+            return
+
+        # 将工具调用结果和初始查询重新发送给 LLM，无论 stream 配置如何都流式输出总结
+        start = time.perf_counter()
+        async for text in self.llm_app.astream_response(
                 prompt_index=2,
-                user_input=f"{query}\n{tool_results}"
-            )
+                user_input=self.build_summary_input(query, tool_results),
+                tools=tools
+        ):
+            yield text
+        self.fast_path.record_summary_latency(time.perf_counter() - start)
 
-        # 获取最终响应文本
-        response_text = response.choices[0].message.content
-        return response_text
+    def build_summary_input(self, query: str, tool_results: List[str]) -> str:
+        """
+        生成第二次 LLM 调用的输入：原问题加上紧凑渲染后的工具结果，总长度受 TOOL_RESULT_MAX_TOKENS 限制。
+
+        :param query: 用户输入的查询语句
+        :param tool_results: 各工具返回的文本
+        :return: 发送给 LLM 的输入
+        """
+        max_tokens = self.config.getint('MCPClient', 'TOOL_RESULT_MAX_TOKENS', fallback=1000)
+        optional_fields = [
+            field.strip()
+            for field in self.config.get('MCPClient', 'TOOL_RESULT_OPTIONAL_FIELDS', fallback='').split(',')
+            if field.strip()
+        ]
+        rendered = fit_tool_results(tool_results, max_tokens, optional_fields)
+        return f"{query}\n工具调用结果：\n" + "\n".join(rendered)
 
-    async def run_tools_concurrently(self, tool_calls: List[Dict]) -> List[str]:
+    async def run_tools_concurrently(self, tool_calls: List[Dict], dedupe: bool = True) -> List[str]:
         """
         并发执行多个工具调用，并处理可能出现的异常。
+        工具名和参数完全相同的调用只执行一次，结果按原始位置分发。
 
         :param tool_calls: 包含工具调用信息的字典列表
-        :return: 工具调用结果列表
+        :param dedupe: 是否合并重复调用
+        :return: 工具调用结果列表，与 tool_calls 一一对应
         """
-        tasks = []
-        for tool_call in tool_calls:
-            try:
-                tool_name = tool_call.get("name")
-                # print(tool_name)
-
-                # 确定当前工具使用哪一个 server 的 session
-                session = self.mcp_session.get(self.tool_map.get(tool_name)).get("session")
-
-                # 创建工具调用任务
-                task = session.call_tool(
-                    tool_name,
-                    tool_call.get("args")
-                )
-                tasks.append(task)
-            except Exception as e:
-                print(f"工具 {tool_call['name']} 准备任务失败: {str(e)}")
+        if dedupe:
+            unique_calls, positions = dedupe_tool_calls(tool_calls)
+            if tool_calls:
+                self.record_dedup(len(tool_calls), len(unique_calls))
+            if len(unique_calls) < len(tool_calls):
+                unique_results = await self.run_tools_concurrently(unique_calls, dedupe=False)
+                return [unique_results[position] for position in positions]
+
+        tasks = [self.call_tool(tool_call.get("name"), tool_call.get("args")) for tool_call in tool_calls]
 
         # 并发执行所有工具调用任务
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        with TRACER.span("tools.batch"):
+            results = await asyncio.gather(*tasks, return_exceptions=True)
 
         processed_results = []
         for i, result in enumerate(results):
@@ -163,6 +908,18 @@ class MCPClient:
 
         return processed_results
 
+    def record_dedup(self, calls: int, executed: int):
+        """
+        记录一轮工具调用的去重情况，有重复时打印本轮去重比例。
+
+        :param calls: 模型给出的调用数
+        :param executed: 实际执行的调用数
+        """
+        self.dedup_stats["calls"] += calls
+        self.dedup_stats["executed"] += executed
+        if executed < calls:
+            print(f"本轮 {calls} 个工具调用中有 {calls - executed} 个重复，去重比例 {1 - executed / calls:.0%}")
+
     async def chat_loop(self):
         """
         运行交互式聊天循环，接收用户输入并处理查询，直到用户输入 'quit' 退出。
@@ -170,47 +927,165 @@ class MCPClient:
         print("\nMCP 客户端已启动！输入 'quit' 退出")
         while True:
             try:
-                # 获取用户输入
-                query = input("\nQuery: ").strip()
+                # 获取用户输入，在线程中等待输入，避免阻塞事件循环中的后台任务（空闲回收、后台校验等）
+                query = (await asyncio.to_thread(input, "\nQuery: ")).strip()
 
                 if query.lower() == 'quit':
                     break
 
-                # 处理用户查询
-                response = await self.process_query(query)
-                print(f"\n🤖 AI: {response}")
+                if query.lower() == 'metrics':
+                    print(await self.export_metrics("prometheus"))
+                    print(self.query_latency_summary())
+                    print(self.tool_selection_summary())
+                    print(self.fast_path.summary())
+                    if self.llm_app.scheduler is not None:
+                        print(self.llm_app.scheduler.summary())
+                    continue
+
+                # 处理用户查询，回答边生成边输出
+                print("\n🤖 AI: ", end="", flush=True)
+                timings = {}
+                try:
+                    async with aclosing(self.process_query(query, timings)) as answer:
+                        async for text in answer:
+                            print(text, end="", flush=True)
+                finally:
+                    # 失败的查询同样记录耗时，首段输出时间只在有输出时记录
+                    if timings.get("ttft") is not None:
+                        self.query_latency["ttft"].record(timings["ttft"])
+                    if "total" in timings:
+                        self.query_latency["total"].record(timings["total"])
+                ttft = f"首段 {timings['ttft']:.2f}s，" if timings.get("ttft") is not None else ""
+                print(f"\n（{ttft}总耗时 {timings['total']:.2f}s）")
+            except LLMUnavailableError as e:
+                reason = "请求过于频繁" if e.rate_limited else "暂时不可用"
+                print(f"\n⚠️ LLM 服务{reason}，请稍后再试: {str(e)}")
             except Exception as e:
                 print(f"\n⚠️ 发生错误: {str(e)}")
 
     async def cleanup(self):
         """
-        清理资源，关闭异步上下文。
+        清理资源，关闭所有服务器连接和异步上下文。
         """
-        await self.exit_stack.aclose()
+        for task in self.background_tasks:
+            task.cancel()
+        await asyncio.gather(*self.background_tasks, return_exceptions=True)
+        self.background_tasks.clear()
+
+        if self.idle_task is not None:
+            self.idle_task.cancel()
+            await asyncio.gather(self.idle_task, return_exceptions=True)
+            self.idle_task = None
+
+        launches = [launch for server_launches in self.server_tasks.values() for launch in server_launches]
+        for task, stop in launches:
+            stop.set()
+        await asyncio.gather(*(task for task, _ in launches), return_exceptions=True)
+        self.server_tasks.clear()
 
     async def connect_to_all_servers(self):
         """
-        连接到所有 MCP 服务器，并设置 LLM 工具。
+        并发连接到所有 MCP 服务器，并设置 LLM 工具。冷启动耗时取决于最慢的服务器，而不是所有服务器之和。
+        已有有效工具清单的 server 先按清单登记工具：懒启动的 server 等首次调用时再启动，
+        其余 server 在后台启动并校验工具，首个查询无需等待慢速 server 启动完成。
         """
+        start = time.perf_counter()
+        cold_paths = []
+        warm_paths = []
         for path in self.server_script_path:
-            print(path)
-            await self.connect_to_mcp_server(path, path)
+            try:
+                manifest_tools = self.manifest.get(path, self.get_server_fingerprint(path, path))
+            except ValueError:
+                manifest_tools = None
+            if manifest_tools is None:
+                cold_paths.append(path)
+                continue
+            self.register_tools(path, manifest_tools)
+            if self.is_lazy(path):
+                self.startup_report[path] = {"status": "lazy", "total": 0.0}
+            else:
+                self.startup_report[path] = {"status": "warm", "total": 0.0}
+                warm_paths.append(path)
+
+        for path in warm_paths:
+            self.background_tasks.append(asyncio.create_task(self._verify_server(path)))
+        await asyncio.gather(*(self.ensure_server(path) for path in cold_paths))
+        self.print_startup_report(time.perf_counter() - start)
+
+        lazy_timeouts = [
+            self.get_server_option(path, 'IDLE_TIMEOUT', fallback=300, getter='getfloat')
+            for path in self.server_script_path if self.is_lazy(path)
+        ]
+        lazy_timeouts = [timeout for timeout in lazy_timeouts if timeout > 0]
+        if lazy_timeouts:
+            interval = max(1.0, min(lazy_timeouts) / 4)
+            self.idle_task = asyncio.create_task(self._reap_idle_servers(interval))
 
         self.set_llm_tools()
 
+    async def export_metrics(self, fmt: str = "json") -> str:
+        """
+        导出客户端和各 MCP 服务器（通过 metrics://tracing 资源）的阶段耗时指标。
+        每个副本是独立进程，各自读取并以 replica 标签区分。
+
+        :param fmt: json 或 prometheus
+        :return: 指标文本，json 格式中服务器按 {服务器: {副本编号: 快照}} 组织
+        """
+        snapshots = {"client": TRACER.snapshot(include_recent=fmt == "json")}
+        series = [({"process": "client"}, snapshots["client"])]
+        for server_name, server in list(self.mcp_session.items()):
+            for replica in list(server["replicas"]):
+                try:
+                    result = await replica["session"].read_resource("metrics://tracing")
+                    snapshot = json.loads(result.contents[0].text)
+                except Exception:
+                    # 服务器未提供指标资源（例如 Java 服务器）时跳过
+                    continue
+                snapshots.setdefault(server_name, {})[str(replica["replica"])] = snapshot
+                series.append(({"process": server_name, "replica": str(replica["replica"])}, snapshot))
+
+        if fmt == "prometheus":
+            return "".join(
+                to_prometheus(snapshot, labels, with_type=i == 0)
+                for i, (labels, snapshot) in enumerate(series)
+            )
+        return json.dumps(snapshots, ensure_ascii=False, indent=2)
+
+    def print_startup_report(self, total: float):
+        """
+        打印各服务器启动阶段耗时。
+
+        :param total: 全部服务器启动的总耗时（秒）
+        """
+        print(f"MCP 服务器启动完成，总耗时 {total:.2f}s")
+        for server_name in self.server_script_path:
+            report = self.startup_report.get(server_name)
+            if report is None:
+                continue
+            if report["status"] == "lazy":
+                print(f"  {server_name}: 懒启动，已从工具清单登记工具")
+            elif report["status"] == "warm":
+                print(f"  {server_name}: 已从工具清单登记工具，正在后台启动校验")
+            elif report["status"] == "ok":
+                print(f"  {server_name}: spawn {report['spawn']:.2f}s, initialize {report['initialize']:.2f}s, "
+                      f"list_tools {report['list_tools']:.2f}s, 副本 {report['replicas']} 个, 合计 {report['total']:.2f}s")
+            else:
+                print(f"  {server_name}: 失败（{report['error']}），耗时 {report['total']:.2f}s")
+
+
+# 服务器脚本路径列表，也可以填写已运行的 SSE 服务器地址（如 http://127.0.0.1:8000/sse），多个客户端共享同一个服务器进程
+SERVER_SCRIPT_PATH = [
+    "mcp_server/mcp-server-0.0.1-SNAPSHOT.jar",
+    "mcp_server/mcp_server_starter.py"
+]
+
 
 async def main():
     # 初始化 LLM
     llm = AIApp(config_file='llm_model/config.ini')
 
-    # 服务器脚本路径列表
-    server_script_path = [
-        "mcp_server/mcp-server-0.0.1-SNAPSHOT.jar",
-        "mcp_server/mcp_server_starter.py"
-    ]
-
     # 创建 MCP 客户端实例
-    client = MCPClient(llm=llm, server_script_path=server_script_path)
+    client = MCPClient(llm=llm, server_script_path=SERVER_SCRIPT_PATH, config_file='config.ini')
 
     try:
         # 连接到所有 MCP 服务器
@@ -224,4 +1099,9 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if "--profile-startup" in sys.argv[1:]:
+        # 只分析启动时的导入耗时，不连接服务器
+        from startup_profile import print_startup_profile
+        print_startup_profile("client")
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -5,6 +5,6 @@ import os
 base_dir = os.path.dirname(os.path.abspath(__file__))
 config_path = os.path.join(base_dir, "config.ini")
 
-# 初始化config文件供包内其他方法调用
+# 初始化config文件供包内其他方法调用，环境变量 MCP_SERVER_CONFIG 指定的文件会覆盖同名配置项
 CONFIG = configparser.ConfigParser()
-CONFIG.read(config_path, encoding='utf-8')
\ No newline at end of file
+CONFIG.read([config_path, os.environ.get('MCP_SERVER_CONFIG', '')], encoding='utf-8')
\ No newline at end of file
@@ -0,0 +1,149 @@
+import json
+import os
+import re
+import sys
+
+package_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(package_dir)
+from mcp_server import CONFIG
+
+# 随包附带的地名数据：省级行政区 -> {拼音, 别名, 城市 -> [拼音, 别名...]}
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer.json')
+
+# 输入中可以省略的行政区划后缀，完整写法查不到时依次尝试去掉。
+# 不含“县”：长沙县、南昌县等与所属地级市同名，去掉后会查成另一个地点；索引中的县以别名登记“××县”写法
+SUFFIXES = ("特别行政区", "维吾尔自治区", "壮族自治区", "回族自治区", "自治区", "自治州", "新区", "林区", "地区",
+            "省", "市", "盟", "区", "province", "sheng", "city", "shi", "district", "qu")
+
+_IGNORED_CHARACTERS = re.compile(r"[\s'’\-_.·,，]")
+
+
+class LocationError(Exception):
+    """地点不在地名索引中，或同名地点有多个无法确定"""
+
+
+def normalize(text: str) -> str:
+    """
+    统一地名写法：去掉空白和标点，英文转小写，拼音中的 ü 统一写作 v。
+
+    :param text: 地名
+    :return: 规范化后的写法
+    """
+    return _IGNORED_CHARACTERS.sub("", text.casefold()).replace("ü", "v").replace("u:", "v")
+
+
+class Gazetteer:
+    """
+    地名索引：把省份、城市的各种写法（全称、简称、别名、拼音）映射到规范的 (省份, 城市)，
+    省份缺失或与城市不符时按城市推断；无法识别的省份、以及未给省份时索引中没有的城市在本地拒绝，不请求上游，
+    省份可识别而城市未收录时按原样查询，或在开启 reject_unknown 时同样拒绝。
+    """
+
+    def __init__(self, data: dict, reject_unknown: bool = False):
+        # 为 False 时省份可识别、城市未收录的地点（如县、县级市）按原样查询，只规范省份写法；为 True 时直接拒绝
+        self.reject_unknown = reject_unknown
+        # 规范化写法 -> 省份
+        self.provinces = {}
+        # 规范化写法 -> [(省份, 城市)]，不同省份可能有同名或同音的城市
+        self.cities = {}
+        for province, entry in data.items():
+            for name in (province, entry["pinyin"], *entry.get("aliases", ())):
+                for key in self._keys(name):
+                    self.provinces.setdefault(key, province)
+            for city, names in entry["cities"].items():
+                for name in (city, *names):
+                    for key in self._keys(name):
+                        locations = self.cities.setdefault(key, [])
+                        if (province, city) not in locations:
+                            locations.append((province, city))
+
+        self.stats = {"resolved": 0, "corrected": 0, "rejected": 0, "passed": 0}
+
+    @classmethod
+    def from_config(cls):
+        """
+        按 config.ini 中的 [Gazetteer] 配置加载地名索引，未开启时返回 None。
+
+        :return: Gazetteer 实例或 None
+        """
+        if not CONFIG.getboolean('Gazetteer', 'ENABLED', fallback=True):
+            return None
+        path = CONFIG.get('Gazetteer', 'PATH', fallback='') or GAZETTEER_PATH
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data, reject_unknown=CONFIG.getboolean('Gazetteer', 'REJECT_UNKNOWN', fallback=False))
+
+    @staticmethod
+    def _keys(name: str) -> set:
+        # 拼音 v 也接受写作 u，如 lvliang / luliang
+        key = normalize(name)
+        return {key, key.replace("v", "u")} if key.isascii() else {key}
+
+    @staticmethod
+    def _lookup(index: dict, text: str):
+        key = normalize(text)
+        if not key:
+            return None
+        if key in index:
+            return index[key]
+        for suffix in SUFFIXES:
+            if key.endswith(suffix) and len(key) > len(suffix) and key[:-len(suffix)] in index:
+                return index[key[:-len(suffix)]]
+        return None
+
+    def resolve(self, province: str, city: str) -> tuple:
+        """
+        把输入的省份和城市转换为规范写法。
+
+        :param province: 省份，可以为空或与城市不符，此时按城市推断
+        :param city: 城市，为空时按省份名查找（直辖市等）
+        :return: (省份, 城市)
+        :raises LocationError: 省份无法识别、只给了省份、同名地点有歧义，或城市不在索引中且无法按原样查询
+        """
+        province = province or ""
+        city = city if city and city.strip() else province
+        province_name = self._lookup(self.provinces, province)
+        # 给出了城市而省份无法识别（如“火星”），不再按城市推断，直接拒绝；只填了省份一栏时仍按其中的地名查找
+        if province_name is None and normalize(province) and city != province:
+            self.stats["rejected"] += 1
+            raise LocationError(f"未找到省份“{province}”，请检查省份名称")
+        candidates = self._lookup(self.cities, city) or []
+
+        matched = [location for location in candidates if location[0] == province_name]
+        if matched:
+            self.stats["resolved"] += 1
+            return matched[0]
+
+        # 城市一栏填的是省份名：省内有同名城市时取该城市（如北京、吉林），否则要求给出具体城市（如江苏、海南）
+        city_as_province = self._lookup(self.provinces, city)
+        if city_as_province is not None and province_name in (None, city_as_province):
+            same = [location for location in candidates if location[0] == city_as_province]
+            if same:
+                self.stats["resolved"] += 1
+                return same[0]
+            province_name = city_as_province
+        if province_name is not None and province_name == city_as_province:
+            self.stats["rejected"] += 1
+            raise LocationError(f"请提供{province_name}的具体城市")
+
+        if len(candidates) == 1:
+            # 省份缺失或与城市不符，以城市所在省份为准
+            self.stats["corrected"] += 1
+            return candidates[0]
+        if candidates:
+            self.stats["rejected"] += 1
+            names = "、".join(f"{location[0]}{location[1]}" for location in candidates)
+            raise LocationError(f"“{city}”对应多个地点：{names}，请提供省份")
+
+        # 只有省份可识别时才按原样查询未收录的城市，未给省份时无从判断，在本地拒绝
+        if not self.reject_unknown and city and province_name is not None:
+            self.stats["passed"] += 1
+            return province_name, "".join(city.split())
+        self.stats["rejected"] += 1
+        place = city if city == province else f"{province}{city}"
+        raise LocationError(f"未找到地点“{place}”，请检查省份和城市名称")
+
+    def snapshot(self) -> dict:
+        return {"provinces": len(set(self.provinces.values())),
+                "cities": len({location for locations in self.cities.values() for location in locations}),
+                "reject_unknown": self.reject_unknown, **self.stats}
@@ -1,28 +1,99 @@
 import asyncio
+import json
+import sys
+from contextlib import asynccontextmanager
 
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
+from pydantic import BaseModel
 import weather_server
+from weather_cache import WeatherCache
+from mcp_server import CONFIG
+from tracing import TRACER
+
+
+# 进入 lifespan 的连接数，sse 模式下每个客户端连接都会进入一次 lifespan
+_connections = 0
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    # 共享的 HTTP 连接池在首次请求天气时创建（推迟 aiohttp 的导入），所有连接共用，最后一个连接断开时才释放
+    global _connections
+    _connections += 1
+    try:
+        yield
+    finally:
+        _connections -= 1
+        if _connections == 0:
+            await weather_server.close_session()
 
 
 # 初始化MCP服务器
-mcp = FastMCP("MCPServer")
+mcp = FastMCP(
+    "MCPServer",
+    lifespan=lifespan,
+    host=CONFIG.get('MCPServer', 'HOST', fallback='127.0.0.1'),
+    port=CONFIG.getint('MCPServer', 'PORT', fallback=8000),
+    log_level=CONFIG.get('MCPServer', 'LOG_LEVEL', fallback='WARNING'),
+)
+
+# 进程内天气缓存，相同地点的并发请求只访问一次上游
+weather_cache = WeatherCache.from_config(weather_server.fetch_weather_data)
 
 @mcp.tool(name="查询当前天气", description="查询当前天气，需要省份和城市")
-async def quary_weather(province: str, city: str) -> str:
-    weather_message = await weather_server.fetch_weather(province, city)
-    print(weather_message)
+async def quary_weather(province: str, city: str, ctx: Context) -> str:
+    with TRACER.trace(request_trace_id(ctx)), TRACER.span("server.tool", tool="查询当前天气"):
+        weather_message = await weather_server.fetch_weather(province, city, fetcher=weather_cache.get,
+                                                             fallback=weather_cache.peek,
+                                                             formatter=weather_server.format_weather_json)
+    # stdio 模式下标准输出是协议通道，这里不能 print
     return weather_message
 
-if __name__ == '__main__':
-    # print(asyncio.run(weather_server.fetch_weather("江苏","南京")))
+class Location(BaseModel):
+    province: str
+    city: str
 
-    # 客户端必须在启动时同时启动当前这个脚本，否则无法顺利通信。这是因为 stdio 模式是一种本地进程间通信（IPC，Inter-Process Communication）方式，
-    # 它需要服务器作为子进程运行，并通过标准输入输出（stdin/stdout）进行数据交换
-    mcp.run(transport='stdio')
+@mcp.tool(name="批量查询天气", description="同时查询多个地点的当前天气，每个地点需要省份和城市，比较多个城市天气时使用")
+async def quary_weather_batch(locations: list[Location], ctx: Context) -> str:
+    if len(locations) > weather_server.BATCH_MAX_LOCATIONS:
+        return f"一次最多查询 {weather_server.BATCH_MAX_LOCATIONS} 个地点"
+    with TRACER.trace(request_trace_id(ctx)), TRACER.span("server.tool", tool="批量查询天气"):
+        return await weather_server.fetch_weather_batch(
+            [(location.province, location.city) for location in locations],
+            fetcher=weather_cache.get, fallback=weather_cache.peek,
+        )
 
+def request_trace_id(ctx: Context):
+    # 客户端通过请求的 _meta.traceId 传入 trace id
+    meta = ctx.request_context.meta
+    return getattr(meta, "traceId", None) if meta is not None else None
 
+@mcp.resource("stats://weather_cache", name="天气缓存统计", mime_type="application/json")
+def weather_cache_stats() -> str:
+    return json.dumps(weather_cache.snapshot(), ensure_ascii=False)
 
+@mcp.resource("stats://weather_limiter", name="天气接口并发上限统计", mime_type="application/json")
+def weather_limiter_stats() -> str:
+    return json.dumps(weather_server.limiter.snapshot(), ensure_ascii=False)
 
+@mcp.resource("stats://gazetteer", name="地名索引统计", mime_type="application/json")
+def gazetteer_stats() -> str:
+    gazetteer = weather_server.gazetteer
+    return json.dumps(gazetteer.snapshot() if gazetteer is not None else {"enabled": False}, ensure_ascii=False)
 
+@mcp.resource("metrics://tracing", name="阶段耗时指标", mime_type="application/json")
+def tracing_metrics() -> str:
+    return json.dumps(TRACER.snapshot(include_recent=True), ensure_ascii=False)
 
+if __name__ == '__main__':
+    # print(asyncio.run(weather_server.fetch_weather("江苏","南京")))
 
+    # stdio 模式：客户端必须在启动时同时启动当前这个脚本，否则无法顺利通信。这是因为 stdio 模式是一种本地进程间通信（IPC，Inter-Process Communication）方式，
+    # 它需要服务器作为子进程运行，并通过标准输入输出（stdin/stdout）进行数据交换
+    # sse 模式：服务器独立运行，客户端通过 HTTP 连接，多个客户端共享同一个进程的连接池和天气缓存
+    if "--profile-startup" in sys.argv[1:]:
+        # 只分析启动时的导入耗时，不启动服务
+        from startup_profile import print_startup_profile
+        print_startup_profile("server")
+    else:
+        mcp.run(transport=CONFIG.get('MCPServer', 'TRANSPORT', fallback='stdio'))
@@ -0,0 +1,161 @@
+import asyncio
+import os
+import sys
+import time
+from collections import OrderedDict
+
+package_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(package_dir)
+from mcp_server import CONFIG
+
+
+def normalize_key(province: str, city: str) -> tuple:
+    """
+    生成缓存键：去掉空白并统一大小写，使同一地点的不同写法共用缓存。
+
+    :param province: 省份
+    :param city: 城市
+    :return: (省份, 城市) 形式的缓存键
+    """
+    return "".join(province.split()).casefold(), "".join(city.split()).casefold()
+
+
+class WeatherCache:
+    """
+    带 TTL 和 LRU 容量上限的天气数据缓存。
+    过期后的 stale_ttl 时间内先返回旧数据并在后台刷新；同一地点并发未命中时只发起一次上游请求。
+    """
+
+    def __init__(self, fetcher, ttl: float = 600, stale_ttl: float = 300, max_size: int = 1024,
+                 enabled: bool = True):
+        # 实际获取数据的协程函数，签名为 fetcher(province, city)
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self.enabled = enabled
+
+        # 缓存键 -> (数据, 获取时间)，按最近使用顺序排列
+        self._entries = OrderedDict()
+
+        # 缓存键 -> 正在进行的上游请求
+        self._inflight = {}
+
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "evictions": 0,
+            "errors": 0,
+        }
+
+    @classmethod
+    def from_config(cls, fetcher):
+        """
+        按 config.ini 中的 [WeatherCache] 配置创建缓存。
+
+        :param fetcher: 实际获取数据的协程函数
+        :return: WeatherCache 实例
+        """
+        return cls(
+            fetcher,
+            ttl=CONFIG.getfloat('WeatherCache', 'TTL', fallback=600),
+            stale_ttl=CONFIG.getfloat('WeatherCache', 'STALE_TTL', fallback=300),
+            max_size=CONFIG.getint('WeatherCache', 'MAX_SIZE', fallback=1024),
+            enabled=CONFIG.getboolean('WeatherCache', 'ENABLED', fallback=True),
+        )
+
+    async def get(self, province: str, city: str):
+        """
+        获取天气数据，优先使用缓存。
+
+        :param province: 省份
+        :param city: 城市
+        :return: fetcher 返回的数据
+        """
+        if not self.enabled:
+            return await self.fetcher(province, city)
+
+        key = normalize_key(province, city)
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                # 先返回旧数据，后台刷新
+                self._entries.move_to_end(key)
+                self.stats["stale_hits"] += 1
+                if key not in self._inflight:
+                    self.stats["refreshes"] += 1
+                    self._start_fetch(key, province, city)
+                return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            task = self._start_fetch(key, province, city)
+        # shield 保证某个调用方被取消时，共享的上游请求仍能为其他调用方完成
+        return await asyncio.shield(task)
+
+    def _start_fetch(self, key: tuple, province: str, city: str) -> asyncio.Task:
+        task = asyncio.create_task(self._fetch(key, province, city))
+        # 后台刷新可能没有等待者，这里取走异常避免 "exception was never retrieved" 警告
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return task
+
+    async def _fetch(self, key: tuple, province: str, city: str):
+        try:
+            value = await self.fetcher(province, city)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+        return value
+
+    def peek(self, province: str, city: str):
+        """
+        不发起请求，直接返回缓存中的数据（即使已过期），用于上游不可用时降级。
+
+        :param province: 省份
+        :param city: 城市
+        :return: (数据, 已缓存秒数)，没有缓存时返回 None
+        """
+        entry = self._entries.get(normalize_key(province, city))
+        if entry is None:
+            return None
+        value, fetched_at = entry
+        return value, time.monotonic() - fetched_at
+
+    def snapshot(self) -> dict:
+        """
+        返回缓存统计信息，用于调整 TTL。
+
+        :return: 命中、未命中、合并请求等计数及当前缓存大小
+        """
+        lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"] + self.stats["coalesced"]
+        hit_ratio = (self.stats["hits"] + self.stats["stale_hits"]) / lookups if lookups else 0.0
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "inflight": len(self._inflight),
+            "hit_ratio": round(hit_ratio, 4),
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "max_size": self.max_size,
+        }
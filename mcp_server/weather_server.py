@@ -1,39 +1,303 @@
 import asyncio
 import os
 import sys
+import time
 
-import aiohttp
 import json
 
 package_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(package_dir)
 from mcp_server import CONFIG
+from tracing import TRACER
+from resilience import AdaptiveLimiter, CircuitBreaker, LimiterTimeoutError
+from mcp_server.gazetteer import Gazetteer, LocationError
 
+TRACER.enabled = CONFIG.getboolean('Tracing', 'ENABLED', fallback=TRACER.enabled)
 
-# 从api获取天气信息
-async def fetch_weather(province: str, city: str) -> str:
-    weather_api = CONFIG.get('WeatherServer', 'WEATHER_API')
-    url = weather_api + f"&sheng={province}&place={city}"
-    async with aiohttp.ClientSession() as session:
-        try:
+
+WEATHER_API = CONFIG.get('WeatherServer', 'WEATHER_API')
+REQUEST_TIMEOUT = CONFIG.getfloat('WeatherServer', 'REQUEST_TIMEOUT', fallback=10)
+MAX_RETRIES = CONFIG.getint('WeatherServer', 'MAX_RETRIES', fallback=2)
+RETRY_BACKOFF = CONFIG.getfloat('WeatherServer', 'RETRY_BACKOFF', fallback=0.2)
+BATCH_CONCURRENCY = CONFIG.getint('WeatherServer', 'BATCH_CONCURRENCY', fallback=8)
+BATCH_MAX_LOCATIONS = CONFIG.getint('WeatherServer', 'BATCH_MAX_LOCATIONS', fallback=20)
+
+# 上游天气接口的熔断器
+breaker = CircuitBreaker(
+    CONFIG.getint('WeatherServer', 'BREAKER_THRESHOLD', fallback=5),
+    CONFIG.getfloat('WeatherServer', 'BREAKER_COOLDOWN', fallback=30),
+)
+
+# 上游天气接口的自适应并发上限，所有工具调用共用
+limiter = AdaptiveLimiter(
+    initial=CONFIG.getfloat('WeatherServer', 'LIMIT_INITIAL', fallback=8),
+    min_limit=CONFIG.getfloat('WeatherServer', 'LIMIT_MIN', fallback=1),
+    max_limit=CONFIG.getfloat('WeatherServer', 'LIMIT_MAX', fallback=32),
+    decrease_factor=CONFIG.getfloat('WeatherServer', 'LIMIT_DECREASE', fallback=0.5),
+    latency_tolerance=CONFIG.getfloat('WeatherServer', 'LATENCY_TOLERANCE', fallback=2.0),
+    queue_timeout=CONFIG.getfloat('WeatherServer', 'QUEUE_TIMEOUT', fallback=5),
+)
+
+# 地名索引，查询前把地点规范为统一写法，未开启时为 None
+gazetteer = Gazetteer.from_config()
+
+# 进程内共享的 HTTP 会话（aiohttp.ClientSession），复用 TCP/TLS 连接和 DNS 缓存
+_session = None
+
+
+async def init_session():
+    """
+    创建进程内共享的 aiohttp 会话，连接池参数读取自 config.ini，重复调用直接返回已有会话。
+    aiohttp 在这里才导入，服务器启动时不需要付出它的导入耗时。
+
+    :return: 共享的 aiohttp.ClientSession
+    """
+    import aiohttp
+
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=CONFIG.getint('WeatherServer', 'CONNECTION_LIMIT', fallback=100),
+            limit_per_host=CONFIG.getint('WeatherServer', 'CONNECTION_LIMIT_PER_HOST', fallback=20),
+            keepalive_timeout=CONFIG.getfloat('WeatherServer', 'KEEPALIVE_TIMEOUT', fallback=60),
+            ttl_dns_cache=CONFIG.getint('WeatherServer', 'DNS_CACHE_TTL', fallback=600),
+        )
+        _session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT))
+    return _session
+
+
+async def close_session():
+    """
+    关闭共享会话及其连接池。
+    """
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+class WeatherAPIError(Exception):
+    """天气接口返回非正常结果"""
+
+
+class RetryableWeatherError(WeatherAPIError):
+    """可以重试的上游错误（429、5xx）"""
+
+
+class WeatherUnavailableError(WeatherAPIError):
+    """上游熔断中或排队超时，暂不请求"""
+
+
+async def _request_weather(url: str) -> dict:
+    import aiohttp
+
+    session = await init_session()
+    try:
+        await limiter.acquire()
+    except LimiterTimeoutError:
+        raise WeatherUnavailableError("天气服务繁忙，请稍后再试") from None
+    start = time.monotonic()
+    # 请求结果用于调整并发上限，请求被取消时为 None
+    outcome = None
+    try:
+        with TRACER.span("weather.upstream"):
             async with session.get(url) as response:
-                if response.status == 200:
-                    json_str = await response.text()
-                    data = json.loads(json_str)
-                    return (f"地点: {data['place']} \n"
-                            f"天气状况（白天）: {data['weather1']}\n"
-                            f"天气状况（夜晚）: {data['weather2']}\n"
-                            f"温度: {data['temperature']}°C\n"
-                            f"降水量: {data['precipitation']}\n"
-                            f"气压: {data['pressure']} hPa\n"
-                            f"湿度: {data['humidity']}%\n"
-                            f"风向: {data['windDirection']}\n"
-                            f"风向角度: {data['windDirectionDegree']}°\n"
-                            f"风速: {data['windSpeed']} m/s\n"
-                            f"风力等级: {data['windScale']}\n")
-                else:
-                    return f"请求失败，状态码: {response.status}"
-        except Exception as e:
-            return f"请求过程中出现错误: {e}"
+                if response.status == 429:
+                    outcome = "throttled"
+                    raise RetryableWeatherError(f"请求过于频繁，状态码: {response.status}")
+                if response.status >= 500:
+                    outcome = "error"
+                    raise RetryableWeatherError(f"请求失败，状态码: {response.status}")
+                outcome = "ok"
+                if response.status != 200:
+                    raise WeatherAPIError(f"请求失败，状态码: {response.status}")
+                json_str = await response.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        outcome = "error"
+        raise
+    finally:
+        limiter.release(time.monotonic() - start, outcome)
+    data = json.loads(json_str)
+    if data.get('code', 200) != 200:
+        raise WeatherAPIError(f"请求失败，接口返回: {data.get('msg', data.get('code'))}")
+    return data
+
+
+# 从api获取原始天气数据
+async def fetch_weather_data(province: str, city: str) -> dict:
+    """
+    请求天气接口并返回解析后的 JSON 数据。上游请求受自适应并发上限约束，超出的请求排队等待；
+    网络错误、超时、429 和 5xx 按指数退避重试，连续失败后熔断，冷却期内直接失败。
+
+    :param province: 省份
+    :param city: 城市
+    :return: 接口返回的天气数据
+    :raises WeatherAPIError: 状态码或接口返回码异常，或上游熔断中、排队超时
+    """
+    if not breaker.allow():
+        raise WeatherUnavailableError("天气服务暂时不可用，请稍后再试")
+
+    import aiohttp
+
+    url = WEATHER_API + f"&sheng={province}&place={city}"
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            data = await _request_weather(url)
+        except (RetryableWeatherError, aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt == MAX_RETRIES:
+                breaker.record_failure()
+                raise
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+        except WeatherUnavailableError:
+            # 排队超时是本地限流，不说明上游的状态
+            raise
+        except WeatherAPIError:
+            # 地点错误等业务错误说明上游可用，不计入熔断
+            breaker.record_success()
+            raise
+        else:
+            breaker.record_success()
+            return data
+
+
+def format_weather(data: dict, note: str = None) -> str:
+    """
+    把天气数据格式化为文本。
+
+    :param data: fetch_weather_data 返回的天气数据
+    :param note: 附加说明，如数据来自缓存
+    :return: 天气描述文本
+    """
+    return ((f"（{note}）\n" if note else "") +
+            f"地点: {data['place']} \n"
+            f"天气状况（白天）: {data['weather1']}\n"
+            f"天气状况（夜晚）: {data['weather2']}\n"
+            f"温度: {data['temperature']}°C\n"
+            f"降水量: {data['precipitation']}\n"
+            f"气压: {data['pressure']} hPa\n"
+            f"湿度: {data['humidity']}%\n"
+            f"风向: {data['windDirection']}\n"
+            f"风向角度: {data['windDirectionDegree']}°\n"
+            f"风速: {data['windSpeed']} m/s\n"
+            f"风力等级: {data['windScale']}\n")
+
+
+def compact_weather(data: dict, note: str = None) -> dict:
+    """
+    把天气数据整理为字段精简的字典，单位直接写在值里，供工具以 JSON 返回。
+
+    :param data: fetch_weather_data 返回的天气数据
+    :param note: 附加说明，如数据来自缓存
+    :return: 精简后的天气字典
+    """
+    result = {
+        "地点": data['place'],
+        "白天": data['weather1'],
+        "夜晚": data['weather2'],
+        "温度": f"{data['temperature']}°C",
+        "降水": data['precipitation'],
+        "湿度": f"{data['humidity']}%",
+        "风向": data['windDirection'],
+        "风力": data['windScale'],
+        "风速": f"{data['windSpeed']}m/s",
+        "气压": f"{data['pressure']}hPa",
+    }
+    if note:
+        result["备注"] = note
+    return result
+
+
+def format_weather_json(data: dict, note: str = None) -> str:
+    """
+    把天气数据格式化为紧凑的 JSON 文本。
+
+    :param data: fetch_weather_data 返回的天气数据
+    :param note: 附加说明，如数据来自缓存
+    :return: JSON 文本
+    """
+    return json.dumps(compact_weather(data, note), ensure_ascii=False, separators=(',', ':'))
+
+
+async def get_weather(province: str, city: str, fetcher=None, fallback=None) -> tuple:
+    """
+    获取天气数据，上游不可用时退回缓存中的旧数据。地点先经地名索引规范化，
+    同一地点的不同写法共用缓存；省份无法识别或地点无法确定时直接返回错误，不请求上游，
+    省份可识别而城市未收录时按原样查询（开启 REJECT_UNKNOWN 时同样返回错误）。
+
+    :param province: 省份
+    :param city: 城市
+    :param fetcher: 获取天气数据的协程函数，默认直接请求接口，可传入 WeatherCache.get 走缓存
+    :param fallback: 上游不可用时获取旧数据的函数，签名为 fallback(province, city) -> (数据, 已缓存秒数) 或 None，
+                     可传入 WeatherCache.peek
+    :return: (天气数据, 附加说明)，出错时为 (None, 错误信息)
+    """
+    fetcher = fetcher or fetch_weather_data
+    if gazetteer is not None:
+        try:
+            province, city = gazetteer.resolve(province, city)
+        except LocationError as e:
+            return None, str(e)
+    try:
+        return await fetcher(province, city), None
+    except Exception as e:
+        if isinstance(e, WeatherAPIError) and not isinstance(e, (RetryableWeatherError, WeatherUnavailableError)):
+            return None, str(e)
+        stale = fallback(province, city) if fallback else None
+        if stale is not None:
+            data, age = stale
+            return data, f"天气服务暂时不可用，以下为 {int(age // 60)} 分钟前的缓存数据"
+        if isinstance(e, WeatherAPIError):
+            return None, str(e)
+        return None, f"请求过程中出现错误: {e}"
+
+
+# 从api获取天气信息
+async def fetch_weather(province: str, city: str, fetcher=None, fallback=None, formatter=format_weather) -> str:
+    """
+    获取天气描述文本，出错时返回错误信息。
+
+    :param province: 省份
+    :param city: 城市
+    :param fetcher: 获取天气数据的协程函数，同 get_weather
+    :param fallback: 上游不可用时获取旧数据的函数，同 get_weather
+    :param formatter: 天气数据的格式化函数，签名为 formatter(data, note)
+    :return: 天气描述文本
+    """
+    data, message = await get_weather(province, city, fetcher=fetcher, fallback=fallback)
+    if data is None:
+        return message
+    return formatter(data, message)
+
+
+async def fetch_weather_batch(locations: list, fetcher=None, fallback=None, concurrency: int = None) -> str:
+    """
+    并发查询多个地点的天气，返回 JSON 数组，单个地点出错时该项为 {"地点", "错误"}，不影响其他地点。
+
+    :param locations: (省份, 城市) 列表
+    :param fetcher: 获取天气数据的协程函数，同 get_weather
+    :param fallback: 上游不可用时获取旧数据的函数，同 get_weather
+    :param concurrency: 同时进行的上游请求数上限，默认读取 BATCH_CONCURRENCY
+    :return: JSON 文本
+    """
+    semaphore = asyncio.Semaphore(concurrency or BATCH_CONCURRENCY)
+
+    async def fetch_one(province, city):
+        async with semaphore:
+            data, message = await get_weather(province, city, fetcher=fetcher, fallback=fallback)
+        if data is None:
+            return {"地点": f"{province}{city}", "错误": message}
+        return compact_weather(data, message)
+
+    results = await asyncio.gather(*(fetch_one(province, city) for province, city in locations))
+    return json.dumps(results, ensure_ascii=False, separators=(',', ':'))
+
+
+async def _main():
+    try:
+        print(await fetch_weather("江苏", "南京"))
+    finally:
+        await close_session()
+
+
 if __name__ == '__main__':
-    print(asyncio.run(fetch_weather("江苏","南京")))
\ No newline at end of file
+    asyncio.run(_main())
\ No newline at end of file
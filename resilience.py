@@ -0,0 +1,189 @@
+import asyncio
+import time
+from collections import deque
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败达到阈值后打开，冷却期内直接拒绝请求；
+    冷却结束后进入半开状态，只放行一个试探请求，成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        # 阈值小于等于 0 时不熔断
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        """
+        判断是否放行本次请求。
+
+        :return: 是否放行
+        """
+        if self.failure_threshold <= 0 or self.state == "closed":
+            return True
+        # 半开状态下的试探请求若被取消而没有结果，冷却时间过后再放行一个试探请求
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failure_threshold <= 0:
+            return
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """
+    最近若干次耗时的滑动窗口，用于计算对冲请求的触发阈值。
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float):
+        """
+        计算百分位数。
+
+        :param p: 百分位（0-100）
+        :return: 百分位耗时（秒），样本不足时返回 None
+        """
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * p / 100))
+        return ordered[index]
+
+
+class LimiterTimeoutError(Exception):
+    """排队超过期限仍未获得并发名额"""
+
+
+class AdaptiveLimiter:
+    """
+    AIMD 自适应并发上限：请求成功且延迟正常时缓慢提高上限（满并发时每轮约加 1），
+    遇到错误、限流或延迟突增时按比例下调（每个请求耗时内最多下调一次）。
+    超出上限的请求按到达顺序排队，超过期限仍未轮到则放弃，不再继续压向上游。
+    """
+
+    def __init__(self, initial: float = 8, min_limit: float = 1, max_limit: float = 64,
+                 decrease_factor: float = 0.5, latency_tolerance: float = 2.0, queue_timeout: float = 5.0,
+                 min_samples: int = 10, smoothing: float = 0.1):
+        self.min_limit = max(1.0, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(self.max_limit, max(self.min_limit, initial))
+        self.decrease_factor = decrease_factor
+        # 耗时超过正常耗时的倍数时视为延迟突增
+        self.latency_tolerance = latency_tolerance
+        self.queue_timeout = queue_timeout
+        # 正常耗时（指数滑动平均）的样本数达到 min_samples 后才判断延迟突增
+        self.min_samples = min_samples
+        self.smoothing = smoothing
+
+        self.inflight = 0
+        self.baseline = None
+        self.samples = 0
+        self.last_decrease = 0.0
+        self._waiters = deque()
+
+        self.stats = {"queued": 0, "timeouts": 0, "increases": 0, "decreases": 0,
+                      "throttled": 0, "errors": 0, "latency_spikes": 0}
+
+    async def acquire(self):
+        """
+        获取一个并发名额，名额已满时排队等待。
+
+        :raises LimiterTimeoutError: 排队超过 queue_timeout 秒
+        """
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.stats["queued"] += 1
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise LimiterTimeoutError(f"排队超过 {self.queue_timeout:.0f}s") from None
+        except asyncio.CancelledError:
+            # 名额已经交给本请求但请求被取消时，把名额交还给下一个排队的请求
+            if future.done() and not future.cancelled():
+                self.inflight -= 1
+                self._wake()
+            raise
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+
+    def release(self, seconds: float, outcome: str = None):
+        """
+        归还名额并根据结果调整上限。
+
+        :param seconds: 请求耗时
+        :param outcome: ok（成功）、throttled（被限流）、error（错误或超时），None 表示请求被取消，不调整上限
+        """
+        now = time.monotonic()
+        if outcome == "ok":
+            spike = (self.samples >= self.min_samples and self.baseline is not None
+                     and seconds > self.baseline * self.latency_tolerance)
+            # 持续变慢时正常耗时也会逐渐跟上，上限不会一直压在最低值
+            self.baseline = seconds if self.baseline is None else self.baseline + self.smoothing * (seconds - self.baseline)
+            self.samples += 1
+            if spike:
+                self.stats["latency_spikes"] += 1
+                self._decrease(now)
+            elif self.inflight >= int(self.limit) and self.limit < self.max_limit:
+                # 只有上限确实限制了并发时才提高
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.stats["increases"] += 1
+        elif outcome in ("throttled", "error"):
+            self.stats["throttled" if outcome == "throttled" else "errors"] += 1
+            self._decrease(now)
+        self.inflight -= 1
+        self._wake()
+
+    def _decrease(self, now: float):
+        # 同一批并发请求的失败只下调一次
+        if now - self.last_decrease < (self.baseline or 0):
+            return
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        self.last_decrease = now
+        self.stats["decreases"] += 1
+
+    def _wake(self):
+        while self._waiters and self.inflight < int(self.limit):
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            self.inflight += 1
+            future.set_result(None)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "inflight": self.inflight,
+            "waiting": len(self._waiters),
+            "baseline_latency": round(self.baseline, 4) if self.baseline is not None else None,
+            **self.stats,
+        }
@@ -0,0 +1,87 @@
+import os
+import re
+import subprocess
+import sys
+import time
+
+package_dir = os.path.dirname(os.path.abspath(__file__))
+
+# 各入口对应的模块及导入时的工作目录（服务器脚本以所在目录作为导入路径）
+ENTRY_POINTS = {
+    "client": ("mcp_client", package_dir),
+    "server": ("mcp_server_starter", os.path.join(package_dir, "mcp_server")),
+}
+
+# -X importtime 的输出格式：import time: 自身耗时(us) | 累计耗时(us) | 缩进的模块名
+_IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def profile_imports(module: str, cwd: str) -> dict:
+    """
+    在子进程中用 -X importtime 导入模块，统计各模块的导入耗时。
+
+    :param module: 模块名
+    :param cwd: 子进程工作目录
+    :return: {"wall": 子进程总耗时, "imports": [(自身耗时, 累计耗时, 模块名, 层级)]}，耗时单位为秒
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, capture_output=True, text=True, encoding='utf-8', errors='replace',
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((int(self_us) / 1e6, int(cumulative_us) / 1e6, name, (len(indent) - 1) // 2))
+    return {"wall": wall, "imports": imports}
+
+
+def measure_import(module: str, cwd: str, iterations: int = 5) -> list:
+    """
+    多次在新进程中导入模块，测量包括解释器启动在内的总耗时。
+
+    :param module: 模块名
+    :param cwd: 子进程工作目录
+    :param iterations: 测量次数
+    :return: 每次的耗时（秒）
+    """
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=cwd, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def print_startup_profile(entry: str, top: int = 15):
+    """
+    打印入口模块的导入耗时报告：总耗时、按顶层包汇总的耗时，以及累计耗时最长的模块。
+
+    :param entry: 入口名称，client 或 server
+    :param top: 显示的条目数
+    """
+    module, cwd = ENTRY_POINTS[entry]
+    profile = profile_imports(module, cwd)
+    imports = profile["imports"]
+    total = next((cumulative for _, cumulative, name, _ in imports if name == module), 0.0)
+
+    by_package = {}
+    for self_time, _, name, _ in imports:
+        package = name.split('.')[0]
+        by_package[package] = by_package.get(package, 0.0) + self_time
+
+    print(f"{entry} 启动导入耗时：导入 {module} 共 {total:.3f}s，进程总耗时 {profile['wall']:.3f}s，"
+          f"共导入 {len(imports)} 个模块")
+    print(f"\n按顶层包汇总（自身耗时之和）：")
+    for package, seconds in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {package:<30}{seconds:>8.3f}s")
+    print(f"\n累计耗时最长的模块：")
+    for _, cumulative, name, level in sorted(imports, key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {name:<50}{cumulative:>8.3f}s")
@@ -0,0 +1,109 @@
+import math
+import re
+from collections import Counter
+
+# 连续的中日韩文字，或连续的字母数字
+_TOKEN_PATTERN = re.compile(r'[\u2e80-\u9fff\uf900-\ufaff]+|[a-z0-9]+')
+
+
+def tokenize(text: str) -> list:
+    """
+    分词：中文按单字和相邻两字切分（不依赖分词词典），英文和数字按单词切分。
+
+    :param text: 文本
+    :return: 词项列表
+    """
+    tokens = []
+    for word in _TOKEN_PATTERN.findall(text.lower()):
+        if word[0].isascii():
+            tokens.append(word)
+            continue
+        tokens.extend(word)
+        tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def _schema_text(schema) -> list:
+    """收集参数 schema 中的参数名、标题、描述和枚举值"""
+    texts = []
+    if isinstance(schema, dict):
+        for key, value in schema.items():
+            if key == "properties" and isinstance(value, dict):
+                texts.extend(value.keys())
+            if key in ("title", "description") and isinstance(value, str):
+                texts.append(value)
+            elif key == "enum" and isinstance(value, list):
+                texts.extend(str(item) for item in value)
+            else:
+                texts.extend(_schema_text(value))
+    elif isinstance(schema, list):
+        for item in schema:
+            texts.extend(_schema_text(item))
+    return texts
+
+
+def tool_document(tool: dict) -> list:
+    """
+    把 format_available_tools 格式化后的工具转换为检索用的词项列表，工具名重复两次以提高权重。
+
+    :param tool: 格式化后的工具
+    :return: 词项列表
+    """
+    function = tool["function"]
+    name_tokens = tokenize(function["name"].replace("_", " "))
+    texts = [function.get("description") or ""] + _schema_text(function.get("input_schema") or {})
+    return name_tokens * 2 + tokenize(" ".join(texts).replace("_", " "))
+
+
+class ToolIndex:
+    """
+    工具的 BM25 词法索引，根据查询挑选最相关的工具，减少每次请求携带的工具定义。
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.tools = []
+        self.term_freqs = []
+        self.doc_lengths = []
+        self.idf = {}
+        self.avg_length = 0.0
+
+    def build(self, tools: list):
+        """
+        重建索引。
+
+        :param tools: format_available_tools 格式化后的工具列表
+        """
+        self.tools = list(tools)
+        self.term_freqs = [Counter(tool_document(tool)) for tool in self.tools]
+        self.doc_lengths = [sum(freqs.values()) for freqs in self.term_freqs]
+        self.avg_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+        doc_freqs = Counter()
+        for freqs in self.term_freqs:
+            doc_freqs.update(freqs.keys())
+        count = len(self.tools)
+        self.idf = {term: math.log(1 + (count - df + 0.5) / (df + 0.5)) for term, df in doc_freqs.items()}
+
+    def search(self, query: str, top_k: int) -> list:
+        """
+        按 BM25 得分返回最相关的工具。
+
+        :param query: 用户查询
+        :param top_k: 最多返回的工具数
+        :return: [(得分, 工具)] 列表，按得分从高到低排列，只包含得分大于 0 的工具
+        """
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        scored = []
+        for tool, freqs, length in zip(self.tools, self.term_freqs, self.doc_lengths):
+            score = 0.0
+            for term in terms:
+                tf = freqs.get(term, 0)
+                if tf:
+                    norm = self.k1 * (1 - self.b + self.b * length / self.avg_length)
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((score, tool))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored[:top_k]
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+
+
+def server_fingerprint(path: str, command: str, args: list, use_hash: bool = False) -> str:
+    """
+    计算服务器指纹：脚本路径、启动命令，以及脚本文件大小和修改时间（或文件内容哈希）。
+    任何一项变化都会使清单失效。
+
+    :param path: 服务器脚本文件路径
+    :param command: 启动命令
+    :param args: 启动参数
+    :param use_hash: 是否用文件内容哈希代替大小和修改时间
+    :return: 指纹字符串
+    """
+    identity = {"path": path, "command": command, "args": list(args)}
+    try:
+        if use_hash:
+            with open(path, 'rb') as f:
+                identity["sha256"] = hashlib.sha256(f.read()).hexdigest()
+        else:
+            stat = os.stat(path)
+            identity["size"] = stat.st_size
+            identity["mtime_ns"] = stat.st_mtime_ns
+    except OSError:
+        identity["missing"] = True
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ToolManifest:
+    """
+    MCP 服务器工具清单的本地持久化，以服务器名称为键保存 format_available_tools 格式化后的工具列表及服务器指纹。
+    客户端可以直接用清单向 LLM 公布工具，而无需先启动服务器调用 list_tools。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        """
+        从磁盘读取清单，文件不存在或损坏时视为空清单。
+        """
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"工具清单读取失败，将重新生成: {e}")
+            self.entries = {}
+
+    def save(self):
+        """
+        写入磁盘，先写临时文件再替换，避免进程中断留下不完整的清单。
+        """
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"工具清单写入失败: {e}")
+
+    def get(self, server_name: str, fingerprint: str):
+        """
+        获取服务器的工具列表。
+
+        :param server_name: 服务器名称
+        :param fingerprint: 当前的服务器指纹
+        :return: 工具列表，没有记录或指纹不一致时返回 None
+        """
+        entry = self.entries.get(server_name)
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return None
+        return entry["tools"]
+
+    def put(self, server_name: str, fingerprint: str, tools: list) -> bool:
+        """
+        记录服务器的工具列表，内容有变化时写入磁盘。
+
+        :param server_name: 服务器名称
+        :param fingerprint: 当前的服务器指纹
+        :param tools: format_available_tools 格式化后的工具列表
+        :return: 清单是否有变化
+        """
+        entry = {"fingerprint": fingerprint, "tools": tools}
+        if self.entries.get(server_name) == entry:
+            return False
+        self.entries[server_name] = entry
+        self.save()
+        return True
@@ -0,0 +1,226 @@
+import contextvars
+import json
+import time
+import uuid
+from collections import deque
+
+# 直方图默认分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 当前查询的 trace id，随 asyncio 任务的上下文自动传递给子任务
+current_trace_id = contextvars.ContextVar("current_trace_id", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class Histogram:
+    """累积分桶直方图，与 Prometheus histogram 语义一致"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> list:
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append([bound, total])
+        return result
+
+
+class _NoopContext:
+    """关闭追踪时返回的空上下文，不做任何计时"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **labels):
+        pass
+
+
+_NOOP = _NoopContext()
+
+
+class Span:
+    """一次阶段计时，退出时写入对应直方图；出现异常时 status 记为 error，被取消或提前关闭时记为 cancelled"""
+
+    __slots__ = ("tracer", "name", "labels", "start")
+
+    def __init__(self, tracer, name: str, labels: dict):
+        self.tracer = tracer
+        self.name = name
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            status = "ok"
+        elif issubclass(exc_type, Exception):
+            status = "error"
+        else:
+            status = "cancelled"
+        self.tracer.observe(self.name, time.perf_counter() - self.start, status=status, **self.labels)
+        return False
+
+    def set(self, **labels):
+        """补充标签，例如在得知结果后标记 cache=hit"""
+        self.labels.update(labels)
+
+
+class _TraceScope:
+    __slots__ = ("trace_id", "token")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.token = None
+
+    def __enter__(self):
+        self.token = current_trace_id.set(self.trace_id)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            current_trace_id.reset(self.token)
+        except ValueError:
+            # 异步生成器未迭代完就被垃圾回收时，会在另一个上下文中关闭，此时无需恢复
+            pass
+        return False
+
+    def set(self, **labels):
+        pass
+
+
+class Tracer:
+    """
+    轻量的阶段耗时追踪：按 (阶段名, 标签) 聚合直方图，并保留最近的若干条 span 便于按 trace id 排查单个慢查询。
+    关闭时 span() 直接返回空上下文，开销可以忽略。
+    """
+
+    def __init__(self, enabled: bool = False, buckets=DEFAULT_BUCKETS, recent_limit: int = 512):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.histograms = {}
+        self.recent = deque(maxlen=recent_limit)
+
+    def span(self, name: str, **labels):
+        """
+        记录一个阶段的耗时，用作上下文管理器。标签应当是低基数的，例如工具名、prompt_index。
+
+        :param name: 阶段名称
+        :return: 上下文管理器
+        """
+        if not self.enabled:
+            return _NOOP
+        return Span(self, name, labels)
+
+    def trace(self, trace_id: str = None):
+        """
+        在当前上下文中设置 trace id，未提供时生成新的 id。
+
+        :param trace_id: 上游传入的 trace id
+        :return: 上下文管理器
+        """
+        if not self.enabled:
+            return _NOOP
+        return _TraceScope(trace_id or new_trace_id())
+
+    def observe(self, name: str, seconds: float, status: str = "ok", **labels):
+        """
+        直接记录一次耗时，用于无法用上下文管理器包裹的阶段（如首 token 时间）。
+
+        :param name: 阶段名称
+        :param seconds: 耗时（秒）
+        :param status: ok 或 error
+        """
+        if not self.enabled:
+            return
+        key = (name, status, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(self.buckets)
+        histogram.observe(seconds)
+        self.recent.append({
+            "trace_id": current_trace_id.get(),
+            "span": name,
+            "status": status,
+            "labels": dict(key[2]),
+            "seconds": round(seconds, 6),
+            "end": time.time(),
+        })
+
+    def snapshot(self, include_recent: bool = False) -> dict:
+        """
+        导出指标快照。
+
+        :param include_recent: 是否包含最近的 span 明细
+        :return: 可 JSON 序列化的字典
+        """
+        series = []
+        for (name, status, labels), histogram in self.histograms.items():
+            series.append({
+                "span": name,
+                "labels": {**dict(labels), "status": status},
+                "count": histogram.count,
+                "sum": histogram.sum,
+                "buckets": histogram.cumulative(),
+            })
+        snapshot = {"enabled": self.enabled, "series": series}
+        if include_recent:
+            snapshot["recent"] = list(self.recent)
+        return snapshot
+
+    def reset(self):
+        self.histograms.clear()
+        self.recent.clear()
+
+
+def to_prometheus(snapshot: dict, extra_labels: dict = None, metric: str = "mcp_span_duration_seconds",
+                  with_type: bool = True) -> str:
+    """
+    把指标快照渲染为 Prometheus 文本格式。
+
+    :param snapshot: Tracer.snapshot() 的结果
+    :param extra_labels: 附加到每条序列的标签，例如 {"process": "server"}
+    :param metric: 指标名称
+    :param with_type: 是否输出 # TYPE 行，拼接多个快照时只需第一个输出
+    :return: Prometheus 文本
+    """
+    def render_labels(labels: dict) -> str:
+        body = ",".join(f'{k}="{json.dumps(str(v), ensure_ascii=False)[1:-1]}"' for k, v in labels.items())
+        return "{" + body + "}"
+
+    lines = [f"# TYPE {metric} histogram"] if with_type else []
+    for series in snapshot.get("series", []):
+        labels = {"span": series["span"], **(extra_labels or {}), **series["labels"]}
+        for bound, count in series["buckets"]:
+            lines.append(f"{metric}_bucket{render_labels({**labels, 'le': bound})} {count}")
+        lines.append(f"{metric}_bucket{render_labels({**labels, 'le': '+Inf'})} {series['count']}")
+        lines.append(f"{metric}_sum{render_labels(labels)} {series['sum']}")
+        lines.append(f"{metric}_count{render_labels(labels)} {series['count']}")
+    return "\n".join(lines) + "\n"
+
+
+# 进程内共享的追踪器，默认关闭
+TRACER = Tracer()
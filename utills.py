@@ -27,4 +27,190 @@ def handle_tool_call(content):
     # tool_call = content.message.tool_calls[0]
     # tool_name = tool_call.function.name
     # tool_args = json.loads(tool_call.function.arguments)
-    # return tool_name, tool_args
\ No newline at end of file
+    # return tool_name, tool_args
+
+
+def canonical_tool_call(tool_call: dict) -> str:
+    """
+    工具调用的规范化表示：工具名 + 按键排序的参数 JSON，参数相同但键顺序或空白不同的调用视为同一调用。
+
+    :param tool_call: {"name": 工具名, "args": 参数}
+    :return: 规范化字符串
+    """
+    args = json.dumps(tool_call.get("args") or {}, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return f"{tool_call.get('name')}:{args}"
+
+
+def dedupe_tool_calls(tool_calls: list) -> tuple:
+    """
+    合并同一轮中重复的工具调用。
+
+    :param tool_calls: 工具调用列表
+    :return: (去重后的工具调用列表, 每个原始调用对应的去重后下标)
+    """
+    unique_calls = []
+    positions = []
+    index_by_key = {}
+    for tool_call in tool_calls:
+        key = canonical_tool_call(tool_call)
+        if key not in index_by_key:
+            index_by_key[key] = len(unique_calls)
+            unique_calls.append(tool_call)
+        positions.append(index_by_key[key])
+    return unique_calls, positions
+
+
+class StreamToolCallAssembler:
+    """
+    流式模式下按 index 拼装 delta.tool_calls。
+    每个工具调用的 JSON 参数一旦完整即返回，调用方可以在模型继续输出其余调用时提前执行它。
+    """
+
+    def __init__(self):
+        # index -> {"name": 工具名, "arguments": 已拼接的参数文本, "done": 是否已返回}
+        self.pending = {}
+
+    def feed(self, chunk) -> list:
+        """
+        处理一个 ChatCompletionChunk。
+
+        :param chunk: 流式响应块
+        :return: 本次新拼装完成的工具调用列表，格式同 handle_tool_call
+        """
+        if not chunk.choices:
+            return []
+        delta = chunk.choices[0].delta
+        if not delta.tool_calls:
+            return []
+
+        completed = []
+        for delta_call in delta.tool_calls:
+            call = self.pending.setdefault(delta_call.index, {"name": "", "arguments": "", "done": False})
+            if call["done"]:
+                continue
+            if delta_call.function is not None:
+                if delta_call.function.name:
+                    call["name"] += delta_call.function.name
+                if delta_call.function.arguments:
+                    call["arguments"] += delta_call.function.arguments
+
+            # JSON 对象只有在右花括号到达时才能被完整解析，解析成功即说明参数已输出完毕
+            if call["name"] and call["arguments"].rstrip().endswith("}"):
+                try:
+                    tool_args = json.loads(call["arguments"])
+                except json.JSONDecodeError:
+                    continue
+                call["done"] = True
+                completed.append({"name": call["name"], "args": tool_args})
+        return completed
+
+    def finish(self) -> list:
+        """
+        流结束后返回仍未完成的工具调用（例如无参数的工具），参数无法解析的调用会被丢弃。
+
+        :return: 剩余工具调用列表
+        """
+        remaining = []
+        for index in sorted(self.pending):
+            call = self.pending[index]
+            if call["done"] or not call["name"]:
+                continue
+            try:
+                tool_args = json.loads(call["arguments"] or "{}")
+            except json.JSONDecodeError as e:
+                print(f"工具 {call['name']} 参数解析失败: {e}")
+                continue
+            call["done"] = True
+            remaining.append({"name": call["name"], "args": tool_args})
+        return remaining
+
+    @property
+    def has_tool_calls(self) -> bool:
+        return bool(self.pending)
+
+def estimate_tokens(text: str) -> float:
+    """
+    粗略估算文本的 token 数：中日韩文字和全角符号按 1 个 token，其余字符按 4 个字符 1 个 token。
+
+    :param text: 文本
+    :return: 估算的 token 数
+    """
+    wide = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return wide + (len(text) - wide) / 4
+
+
+def render_tool_result(text: str, drop_fields=()) -> str:
+    """
+    把工具返回的文本渲染为紧凑形式：JSON 对象渲染为一行 "字段:值"，JSON 数组每项一行，其他文本压缩空白。
+
+    :param text: 工具返回的文本
+    :param drop_fields: 需要去掉的字段名
+    :return: 渲染后的文本
+    """
+    try:
+        value = json.loads(text)
+    except (TypeError, ValueError):
+        return " ".join(str(text).split())
+
+    def render(item):
+        if isinstance(item, dict):
+            return " ".join(f"{key}:{render_value(val)}" for key, val in item.items() if key not in drop_fields)
+        return render_value(item)
+
+    def render_value(item):
+        if isinstance(item, str):
+            return item
+        return json.dumps(item, ensure_ascii=False, separators=(',', ':'))
+
+    if isinstance(value, list):
+        return "\n".join(render(item) for item in value)
+    return render(value)
+
+
+def truncate_to_tokens(text: str, max_tokens: float) -> str:
+    """
+    按估算的 token 数截断文本。
+
+    :param text: 文本
+    :param max_tokens: token 上限
+    :return: 截断后的文本，发生截断时末尾加上标记
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    marker = "…（已截断）"
+    budget = max_tokens - estimate_tokens(marker)
+    used = 0
+    for i, ch in enumerate(text):
+        used += 1 if ord(ch) >= 0x2E80 else 0.25
+        if used > budget:
+            return text[:i] + marker
+    return text
+
+
+def fit_tool_results(results: list, max_tokens: float, optional_fields=()) -> list:
+    """
+    把工具结果渲染为紧凑文本并控制总 token 数：超出预算时先去掉可选字段，仍超出则按公平份额截断较长的结果，
+    较短的结果保持完整，剩余额度分给其他结果。
+
+    :param results: 工具返回的文本列表
+    :param max_tokens: 总 token 预算，小于等于 0 表示不限制
+    :param optional_fields: 超出预算时优先去掉的字段名
+    :return: 渲染后的文本列表，顺序与 results 一致
+    """
+    rendered = [render_tool_result(text) for text in results]
+    if max_tokens <= 0 or sum(estimate_tokens(text) for text in rendered) <= max_tokens:
+        return rendered
+
+    if optional_fields:
+        rendered = [render_tool_result(text, optional_fields) for text in results]
+        if sum(estimate_tokens(text) for text in rendered) <= max_tokens:
+            return rendered
+
+    remaining = max_tokens
+    limits = {}
+    order = sorted(range(len(rendered)), key=lambda i: estimate_tokens(rendered[i]))
+    for position, i in enumerate(order):
+        share = remaining / (len(order) - position)
+        limits[i] = min(estimate_tokens(rendered[i]), share)
+        remaining -= limits[i]
+    return [truncate_to_tokens(text, limits[i]) for i, text in enumerate(rendered)]